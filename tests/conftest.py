@@ -0,0 +1,107 @@
+import os, sys, datetime
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import xbrl_to_json
+
+CONTEXT_XML = '<xbrli:context id="{context_id}"><xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">0001</xbrli:identifier>{segment}</xbrli:entity><xbrli:period>{period}</xbrli:period></xbrli:context>'
+MEMBER_XML = '<xbrldi:explicitMember dimension="{axis}">{member}</xbrldi:explicitMember>'
+# (id, explicit members, start, end), no start is an instant
+CONTEXT_LIST = [
+    ("FY2020", [], "2020-01-01", "2020-12-31"),
+    ("FY2019", [], "2019-01-01", "2019-12-31"),
+    ("Q4FY2020", [], "2020-10-01", "2020-12-31"),
+    ("I2020", [], None, "2020-12-31"),
+    ("FY2020_us-gaap_StatementGeographicalAxis_country_USMember", [("us-gaap:StatementGeographicalAxis", "country:US")], "2020-01-01", "2020-12-31"),
+    ("FY2020_us-gaap_StatementGeographicalAxis_country_USMember_srt_ProductOrServiceAxis_abc_WidgetMember",
+     [("us-gaap:StatementGeographicalAxis", "country:US"), ("srt:ProductOrServiceAxis", "abc:WidgetMember")], "2020-01-01", "2020-12-31"),
+    ]
+# (concept, contextRef, decimals, value)
+FACT_LIST = [
+    ("Revenues", "FY2020", "-3", "1000000"),
+    ("Revenues", "FY2019", "-3", "900000"),
+    ("Revenues", "Q4FY2020", "-3", "300000"),
+    ("Revenues", "FY2020_us-gaap_StatementGeographicalAxis_country_USMember", "-3", "600000"),
+    ("Revenues", "FY2020_us-gaap_StatementGeographicalAxis_country_USMember_srt_ProductOrServiceAxis_abc_WidgetMember", "-3", "250000"),
+    ("NetIncomeLoss", "FY2020", "-3", "-250000"),
+    ("Assets", "I2020", "-3", "5000000"),
+    ]
+# (concept, role, label)
+LABEL_LIST = [
+    ("Revenues", "label", "Revenues"),
+    ("Revenues", "terseLabel", "Revenue"),
+    ("NetIncomeLoss", "label", "Net Income (Loss)"),
+    ("Assets", "label", "Assets"),
+    ]
+
+def return_instance_xml(fact_list):
+    context_xml_list = []
+    for context_id, member_list, start, end in CONTEXT_LIST:
+        segment = ""
+        if member_list:
+            segment = "<xbrli:segment>{}</xbrli:segment>".format("".join(MEMBER_XML.format(axis=axis, member=member) for axis, member in member_list))
+        if start:
+            period = "<xbrli:startDate>{}</xbrli:startDate><xbrli:endDate>{}</xbrli:endDate>".format(start, end)
+        else:
+            period = "<xbrli:instant>{}</xbrli:instant>".format(end)
+        context_xml_list.append(CONTEXT_XML.format(context_id=context_id, segment=segment, period=period))
+    fact_xml_list = ['<us-gaap:{0} contextRef="{1}" unitRef="usd" decimals="{2}">{3}</us-gaap:{0}>'.format(*fact) for fact in fact_list]
+    return ('<?xml version="1.0"?>\n'
+            '<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:us-gaap="http://fasb.org/us-gaap/2020" xmlns:xbrldi="http://xbrl.org/2006/xbrldi" '
+            'xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:iso4217="http://www.xbrl.org/2003/iso4217">\n'
+            + "\n".join(context_xml_list)
+            + '\n<xbrli:unit id="usd"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>\n'
+            + "\n".join(fact_xml_list)
+            + '\n</xbrli:xbrl>\n')
+
+def return_label_xml():
+    element_list = []
+    for concept in sorted(set(concept for concept, role, label in LABEL_LIST)):
+        element_list.append('<link:loc xlink:type="locator" xlink:href="http://xbrl.fasb.org/us-gaap-2020.xsd#us-gaap_{0}" xlink:label="loc_us-gaap_{0}"/>'.format(concept))
+        for label_concept, role, label in LABEL_LIST:
+            if label_concept == concept:
+                element_list.append('<link:label id="lab_us-gaap_{0}_{1}_en-US" xlink:label="lab_us-gaap_{0}" xlink:role="http://www.xbrl.org/2003/role/{1}" xlink:type="resource" xml:lang="en-US">{2}</link:label>'.format(concept, role, label))
+        element_list.append('<link:labelArc xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="loc_us-gaap_{0}" xlink:to="lab_us-gaap_{0}" xlink:type="arc"/>'.format(concept))
+    return ('<?xml version="1.0"?>\n<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">'
+            '<link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">\n'
+            + "\n".join(element_list)
+            + '\n</link:labelLink></link:linkbase>\n')
+
+def return_presentation_xml():
+    ''' the Revenues locator is in there twice, exactly the same '''
+    element_list = []
+    for concept in ["Revenues", "Revenues", "NetIncomeLoss"]:
+        element_list.append('<link:loc xlink:type="locator" xlink:href="http://xbrl.fasb.org/us-gaap-2020.xsd#us-gaap_{0}" xlink:label="loc_us-gaap_{0}"/>'.format(concept))
+    element_list.append('<link:presentationArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/parent-child" xlink:from="loc_us-gaap_Revenues" xlink:to="loc_us-gaap_NetIncomeLoss" order="1"/>')
+    return ('<?xml version="1.0"?>\n<link:linkbase xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">'
+            '<link:presentationLink xlink:type="extended" xlink:role="http://abc.com/role/IncomeStatement">\n'
+            + "\n".join(element_list)
+            + '\n</link:presentationLink></link:linkbase>\n')
+
+def write_filing(folder_path, fact_list=FACT_LIST):
+    ''' a small abc 10-K: instance, labels and presentation '''
+    os.makedirs(folder_path, exist_ok=True)
+    basename = os.path.basename(folder_path)
+    for suffix, xml in [(".xml", return_instance_xml(fact_list)), ("_lab.xml", return_label_xml()), ("_pre.xml", return_presentation_xml())]:
+        with open(os.path.join(folder_path, basename + suffix), "w") as outfile:
+            outfile.write(xml)
+    return folder_path
+
+@pytest.fixture
+def filing_folder(tmp_path):
+    return write_filing(str(tmp_path / "abc-20201231"))
+
+@pytest.fixture
+def fake_download(tmp_path, monkeypatch):
+    ''' XBRL_Data goes in tmp_path (it's relative to the working directory) and the SEC download
+        is replaced by one that writes the small filing, dated 10 days ago. returns the list of download calls
+    '''
+    monkeypatch.chdir(tmp_path)
+    data_date = (datetime.date.today() - datetime.timedelta(days=10)).strftime("%Y%m%d")
+    call_list = []
+    def full_sec_xbrl_folder_download(ticker, cik, form_type, date="most recent", previous_error=False):
+        call_list.append((ticker, form_type, date))
+        folder_name = write_filing(os.path.join("XBRL_Data", ticker, form_type, "{}-{}".format(ticker.lower(), data_date)))
+        return folder_name, data_date, "1234", "US", form_type
+    monkeypatch.setattr(xbrl_to_json, "full_sec_xbrl_folder_download", full_sec_xbrl_folder_download)
+    return call_list
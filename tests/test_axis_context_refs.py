@@ -0,0 +1,46 @@
+import anytree
+import xbrl_to_json
+
+GEOGRAPHICAL_CONTEXT_REF = "FY2020_us-gaap_StatementGeographicalAxis_country_USMember"
+WIDGET_CONTEXT_REF = "FY2020_us-gaap_StatementGeographicalAxis_country_USMember_srt_ProductOrServiceAxis_abc_WidgetMember"
+
+def return_fact_node(root_node, concept, contextRef):
+    return anytree.find(root_node, lambda node: node.name == concept and getattr(node, "attrib", {}).get("contextRef") == contextRef)
+
+def test_every_axis_and_member_nests(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    widget_fact = return_fact_node(root_node, "Revenues", WIDGET_CONTEXT_REF)
+    assert [node.name for node in widget_fact.path[1:]] == ["Revenues", "StatementGeographicalAxis", "USMember", "ProductOrServiceAxis", "WidgetMember", "Revenues"]
+    geographical_fact = return_fact_node(root_node, "Revenues", GEOGRAPHICAL_CONTEXT_REF)
+    # both facts share the StatementGeographicalAxis/USMember subparents
+    assert geographical_fact.parent is widget_fact.parent.parent.parent
+    revenues_node = widget_fact.path[1]
+    assert len([child for child in revenues_node.children if getattr(child, "axis", False)]) == 1
+
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder)
+    revenues_dict = xbrl_to_json.import_json("{}_facts_dict.json".format(filing_folder))["abc"]["Revenues"]
+    member_dict = revenues_dict["StatementGeographicalAxis"]["USMember"]
+    assert member_dict["2020-01-01:2020-12-31"] == "600000"
+    assert member_dict["ProductOrServiceAxis"]["WidgetMember"]["2020-01-01:2020-12-31"] == "250000"
+    assert revenues_dict["2020-01-01:2020-12-31"] == "1000000"
+
+def test_subparents_come_from_the_map_not_the_children():
+    ''' a fact whose suffix looks like a member is never used as a subparent, even after it moves '''
+    concept_node = anytree.Node("Revenues", suffix="Revenues")
+    member_fact = anytree.Node("USMember", parent=concept_node, suffix="USMember", attrib={"contextRef": "FY2020"})
+    first_fact = anytree.Node("Revenues", parent=concept_node, suffix="Revenues", attrib={"contextRef": GEOGRAPHICAL_CONTEXT_REF})
+    second_fact = anytree.Node("Revenues", parent=concept_node, suffix="Revenues", attrib={"contextRef": WIDGET_CONTEXT_REF})
+    member_only_fact = anytree.Node("Revenues", parent=concept_node, suffix="Revenues", attrib={"contextRef": "FY2020_country_USMember"})
+    axis_subparent_dict = {}
+    for node in [member_fact, first_fact, second_fact, member_only_fact]:
+        replacement_parent = xbrl_to_json.return_new_parent_for_Axis_contextRefs(node, axis_subparent_dict)
+        if replacement_parent:
+            node.parent = replacement_parent
+    assert member_fact.parent is concept_node
+    assert first_fact.parent.name == "USMember" and first_fact.parent.axis
+    assert first_fact.parent.parent.name == "StatementGeographicalAxis"
+    assert second_fact.parent.name == "WidgetMember"
+    assert second_fact.parent.parent.parent is first_fact.parent
+    assert member_only_fact.parent is not member_fact
+    assert member_only_fact.parent.parent is concept_node and member_only_fact.parent.axis
+    assert all(getattr(subparent, "axis", False) for suffix_subparent_dict in axis_subparent_dict.values() for subparent in suffix_subparent_dict.values())
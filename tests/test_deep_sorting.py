@@ -0,0 +1,127 @@
+import random
+import anytree
+import pytest
+import xbrl_to_json
+from conftest import write_filing
+
+LABEL = "{http://www.w3.org/1999/xlink}label"
+
+def old_label_scan(label, fact_tree_children_dict):
+    ''' steps 3 and 5 of return_new_parent, before the index '''
+    for suffix, tree_node in fact_tree_children_dict.items():
+        if suffix in label:
+            try:
+                parent_label = tree_node.attrib.get(LABEL)
+            except:
+                parent_label = None
+            if parent_label:
+                if label == parent_label:
+                    return tree_node
+            parent = xbrl_to_json.recursive_label_node_getter(tree_node, label)
+            if parent:
+                return parent
+
+def old_round_two_scan(attribute, fact_tree_children_dict):
+    ''' return_new_parent_round_two, before the index '''
+    for suffix, tree_node in fact_tree_children_dict.items():
+        if suffix == attribute:
+            return tree_node
+        elif suffix in attribute:
+            parent = xbrl_to_json.recursive_node_id_getter(tree_node, attribute)
+            if parent:
+                return parent
+            parent = xbrl_to_json.recursive_label_node_getter(tree_node, attribute)
+            if parent:
+                return parent
+
+def return_sorting_trees():
+    ''' Revenue is in Revenues and in CostOfRevenue, so those strings match more than one suffix '''
+    fact_tree_root = anytree.Node("facts")
+    other_tree_root = anytree.Node("other")
+    for suffix in ["Revenue", "Revenues", "CostOfRevenue", "Assets"]:
+        anytree.Node(suffix, parent=fact_tree_root, suffix=suffix, attrib={})
+    fact_tree_children_dict = {node.suffix: node for node in fact_tree_root.children}
+    revenue = fact_tree_children_dict["Revenue"]
+    revenues = fact_tree_children_dict["Revenues"]
+    cost_of_revenue = fact_tree_children_dict["CostOfRevenue"]
+    # the same label under two suffixes, the first suffix in dict order wins
+    anytree.Node("loc", parent=revenues, suffix="Revenues", attrib={LABEL: "loc_us-gaap_Revenues", "id": "loc_1"})
+    anytree.Node("loc", parent=revenue, suffix="Revenue", attrib={LABEL: "loc_us-gaap_Revenues", "id": "loc_2"})
+    # twice in one subtree, pre-order wins
+    arc = anytree.Node("arc", parent=cost_of_revenue, suffix="CostOfRevenue", attrib={})
+    anytree.Node("loc", parent=arc, suffix="CostOfRevenue", attrib={LABEL: "loc_us-gaap_CostOfRevenue", "id": "deep"})
+    anytree.Node("loc", parent=cost_of_revenue, suffix="CostOfRevenue", attrib={LABEL: "loc_us-gaap_CostOfRevenue", "id": "shallow"})
+    # an id that equals a label elsewhere
+    anytree.Node("label", parent=revenues, suffix="Revenues", attrib={"id": "lab_us-gaap_CostOfRevenue"})
+    # not in the fact tree (yet)
+    anytree.Node("loc", parent=other_tree_root, suffix="Assets", attrib={LABEL: "loc_us-gaap_Assets", "id": "other_1"})
+    return fact_tree_root, other_tree_root, fact_tree_children_dict
+
+LOOK_UP_LIST = [
+    "loc_us-gaap_Revenues",
+    "lab_us-gaap_Revenues",
+    "loc_us-gaap_CostOfRevenue",
+    "lab_us-gaap_CostOfRevenue",
+    "loc_us-gaap_Assets",
+    "Revenues",
+    "Revenue",
+    "loc_1",
+    "loc_2",
+    "deep",
+    "nothing",
+    ]
+
+@pytest.mark.parametrize("look_up", LOOK_UP_LIST)
+def test_index_matches_old_scan(look_up):
+    fact_tree_root, other_tree_root, fact_tree_children_dict = return_sorting_trees()
+    label_and_id_index = xbrl_to_json.LabelAndIdIndex(fact_tree_root, other_tree_root, fact_tree_children_dict)
+    assert label_and_id_index.label_node(look_up) is old_label_scan(look_up, fact_tree_children_dict)
+    assert label_and_id_index.id_or_label_node(look_up) is old_round_two_scan(look_up, fact_tree_children_dict)
+
+def test_index_follows_moved_nodes():
+    fact_tree_root, other_tree_root, fact_tree_children_dict = return_sorting_trees()
+    label_and_id_index = xbrl_to_json.LabelAndIdIndex(fact_tree_root, other_tree_root, fact_tree_children_dict)
+    assert label_and_id_index.label_node("loc_us-gaap_Assets") is None
+    assets_loc = other_tree_root.children[0]
+    assets_loc.parent = fact_tree_children_dict["Assets"]
+    assert label_and_id_index.label_node("loc_us-gaap_Assets") is assets_loc
+    assert label_and_id_index.label_node("loc_us-gaap_Assets") is old_label_scan("loc_us-gaap_Assets", fact_tree_children_dict)
+
+def test_filing_output_matches_old_scan(filing_folder, tmp_path, monkeypatch):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    indexed_dict = xbrl_to_json.convert_tree_to_dict(root_node)
+
+    class OldScan:
+        def __init__(self, fact_tree_root, other_tree_root, fact_tree_children_dict):
+            self.fact_tree_children_dict = fact_tree_children_dict
+        def label_node(self, label):
+            return old_label_scan(label, self.fact_tree_children_dict)
+        def id_or_label_node(self, attribute):
+            return old_round_two_scan(attribute, self.fact_tree_children_dict)
+    monkeypatch.setattr(xbrl_to_json, "LabelAndIdIndex", OldScan)
+    old_folder = write_filing(str(tmp_path / "old" / "abc-20201231"))
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", old_folder, sic="1234", country_code="US")
+    assert xbrl_to_json.convert_tree_to_dict(root_node) == indexed_dict
+
+# overlapping on purpose: prefixes, suffixes and one inside another
+SUFFIX_LIST = ["Revenues", "Revenue", "CostOfRevenue", "Rev", "enue", "OfRev", "Assets", "sets", "s"]
+
+@pytest.mark.parametrize("string", [
+    "loc_us-gaap_Revenues",
+    "lab_us-gaap_CostOfRevenue_label",
+    "Assets",
+    "AssetsRevenueRevenues",
+    "RevRevRevenue",
+    "",
+    "nothing_here",
+    ])
+def test_suffix_matcher_matches_linear_loop(string):
+    suffix_matcher = xbrl_to_json.SuffixMatcher(SUFFIX_LIST)
+    assert suffix_matcher.matching_suffixes(string) == [suffix for suffix in SUFFIX_LIST if suffix in string]
+
+def test_suffix_matcher_random_strings():
+    suffix_matcher = xbrl_to_json.SuffixMatcher(SUFFIX_LIST + [""])
+    random_generator = random.Random(8)
+    for _ in range(500):
+        string = "".join(random_generator.choice(SUFFIX_LIST + ["_", "x", "R", "e"]) for _ in range(random_generator.randint(0, 6)))
+        assert suffix_matcher.matching_suffixes(string) == [suffix for suffix in SUFFIX_LIST + [""] if suffix in string]
@@ -0,0 +1,62 @@
+import csv, os
+import pytest
+import xbrl_to_json
+
+WIDGET_DIMENSIONS = "StatementGeographicalAxis=USMember|ProductOrServiceAxis=WidgetMember"
+
+@pytest.fixture
+def converted_filing(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    return root_node, filing_folder
+
+def test_one_row_per_numeric_fact(converted_filing):
+    root_node, folder_name = converted_filing
+    fact_column_dict = xbrl_to_json.return_fact_column_dict(root_node)
+    assert list(fact_column_dict) == [column for column, column_type in xbrl_to_json.FACT_COLUMN_LIST]
+    row_list = list(zip(*fact_column_dict.values()))
+    assert len(row_list) == 7
+    row_dict = {(row[0], row[2]): dict(zip(fact_column_dict, row)) for row in row_list}
+    widget_row = row_dict[("Revenues", "FY2020_us-gaap_StatementGeographicalAxis_country_USMember_srt_ProductOrServiceAxis_abc_WidgetMember")]
+    assert widget_row["dimensions"] == WIDGET_DIMENSIONS
+    assert (widget_row["period_start"], widget_row["period_end"], widget_row["instant"]) == ("2020-01-01", "2020-12-31", False)
+    assert (widget_row["value"], widget_row["decimals"]) == (250000.0, -3.0)
+    assets_row = row_dict[("Assets", "I2020")]
+    assert (assets_row["period_start"], assets_row["period_end"], assets_row["instant"]) == ("", "2020-12-31", True)
+    assert row_dict[("NetIncomeLoss", "FY2020")]["value"] == -250000.0
+
+def test_csv_from_the_facts_dict_step(converted_filing):
+    root_node, folder_name = converted_filing
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name, fact_columns_format="csv")
+    fact_column_dict = xbrl_to_json.return_fact_column_dict(root_node)
+    with open("{}_facts.csv".format(folder_name), newline='') as inputfile:
+        row_list = list(csv.DictReader(inputfile))
+    assert [row["concept"] for row in row_list] == fact_column_dict["concept"]
+    assert [row["dimensions"] for row in row_list] == fact_column_dict["dimensions"]
+    assert [float(row["value"]) for row in row_list] == fact_column_dict["value"]
+
+def test_npz(converted_filing):
+    numpy = pytest.importorskip("numpy")
+    root_node, folder_name = converted_filing
+    fact_column_dict = xbrl_to_json.return_fact_column_dict(root_node)
+    xbrl_to_json.write_fact_columns(fact_column_dict, folder_name, "npz")
+    with numpy.load("{}_facts.npz".format(folder_name)) as npz_file:
+        assert sorted(npz_file.files) == sorted(fact_column_dict)
+        assert npz_file["value"].dtype == numpy.float64
+        assert npz_file["value"].tolist() == fact_column_dict["value"]
+        assert npz_file["instant"].tolist() == fact_column_dict["instant"]
+        assert npz_file["dimensions"].tolist() == fact_column_dict["dimensions"]
+
+def test_parquet(converted_filing):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    root_node, folder_name = converted_filing
+    fact_column_dict = xbrl_to_json.return_fact_column_dict(root_node)
+    xbrl_to_json.write_fact_columns(fact_column_dict, folder_name, "parquet")
+    assert pyarrow.parquet.read_table("{}_facts.parquet".format(folder_name)).to_pydict() == fact_column_dict
+
+def test_csv_when_numpy_is_missing(converted_filing, monkeypatch):
+    monkeypatch.setattr(xbrl_to_json, "numpy", None)
+    root_node, folder_name = converted_filing
+    xbrl_to_json.write_fact_columns(xbrl_to_json.return_fact_column_dict(root_node), folder_name, "npz")
+    assert os.path.exists("{}_facts.csv".format(folder_name))
+    assert not os.path.exists("{}_facts.npz".format(folder_name))
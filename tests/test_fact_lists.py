@@ -0,0 +1,34 @@
+import random
+import anytree
+import xbrl_to_json
+
+def return_list_fact_tree(fact_list):
+    ''' a concept whose facts have no contextRef, like the ones .xsd and linkbase elements leave behind '''
+    root_node = anytree.Node("abc")
+    anytree.Node("context_dict", parent=root_node, attrib={})
+    anytree.Node("label", parent=root_node, suffix="label")
+    concept_node = anytree.Node("Notes", parent=root_node, suffix="Notes")
+    for fact in fact_list:
+        anytree.Node("Notes", parent=concept_node, suffix="Notes", fact=fact, attrib={})
+    return root_node
+
+def old_list_entry(fact_list):
+    ''' the old "fact not in list", append and sort '''
+    dict_list = None
+    for fact in fact_list:
+        if fact in ["", None]:
+            continue
+        if dict_list is None:
+            dict_list = [fact]
+        elif fact not in dict_list:
+            dict_list.append(fact)
+            dict_list.sort()
+    return dict_list
+
+def test_list_facts_are_unique_and_sorted(tmp_path):
+    random_generator = random.Random(23)
+    fact_list = [random_generator.choice(["b", "a", "c", "Z", "10", "9", ""]) for i in range(1000)]
+    facts_dict = xbrl_to_json.convert_root_node_facts_to_fact_dict(return_list_fact_tree(fact_list), "abc", str(tmp_path / "abc"))
+    assert facts_dict["abc"]["Notes"]["list"] == old_list_entry(fact_list)
+    # and it is still a list in the json
+    assert xbrl_to_json.import_json(str(tmp_path / "abc_facts_dict.json")) == facts_dict
@@ -0,0 +1,72 @@
+import decimal, math
+import pytest
+import xbrl_to_json
+from conftest import FACT_LIST, write_filing
+
+MEMBER_CONTEXT = "FY2020_us-gaap_StatementGeographicalAxis_country_USMember"
+
+def return_facts_dict(tmp_path, fact_list):
+    folder_name = write_filing(str(tmp_path / "abc-20201231"), fact_list)
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", folder_name, sic="1234", country_code="US")
+    return xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name)["abc"]
+
+@pytest.mark.parametrize("competing_list, kept_value, kept_decimals", [
+    ([("-6", "1000000"), ("-3", "1234000")], "1234000", "-3"),
+    ([("-3", "1234000"), ("-6", "1000000")], "1234000", "-3"),
+    ([("-3", "1234000"), ("INF", "1234567"), ("-6", "1000000")], "1234567", "INF"),
+    ])
+def test_more_precise_duplicate_is_kept(tmp_path, competing_list, kept_value, kept_decimals):
+    # as strings "-6" > "-3", as numbers -3 is the more precise
+    fact_list = [fact for fact in FACT_LIST if fact[1] not in ["FY2020", MEMBER_CONTEXT]]
+    for decimals, value in competing_list:
+        fact_list.append(("Revenues", "FY2020", decimals, value))
+        fact_list.append(("Revenues", MEMBER_CONTEXT, decimals, value))
+    revenues_dict = return_facts_dict(tmp_path, fact_list)["Revenues"]
+    assert revenues_dict["2020-01-01:2020-12-31"] == kept_value
+    assert revenues_dict["2020-01-01:2020-12-31_attrib"]["decimals"] == kept_decimals
+    member_dict = revenues_dict["StatementGeographicalAxis"]["USMember"]
+    assert member_dict["2020-01-01:2020-12-31"] == kept_value
+    assert member_dict["2020-01-01:2020-12-31_attrib"]["decimals"] == kept_decimals
+
+def test_return_decimals_int():
+    assert xbrl_to_json.return_decimals_int("-3") == -3
+    assert xbrl_to_json.return_decimals_int(" 2 ") == 2
+    assert xbrl_to_json.return_decimals_int("INF") == math.inf
+    assert xbrl_to_json.return_decimals_int("inf") > xbrl_to_json.return_decimals_int("10")
+    assert xbrl_to_json.return_decimals_int("-3") > xbrl_to_json.return_decimals_int("-6")
+    assert xbrl_to_json.return_decimals_int(None) is None
+    assert xbrl_to_json.return_decimals_int("abc") is None
+
+def test_return_fact_value():
+    assert xbrl_to_json.return_fact_value("-250000") == -250000.0
+    assert xbrl_to_json.return_fact_value("0.1", exact=True) == decimal.Decimal("0.1")
+    for fact in [None, "", "some text", "nan", "inf"]:
+        assert xbrl_to_json.return_fact_value(fact) is None
+        assert xbrl_to_json.return_fact_value(fact, exact=True) is None
+
+@pytest.fixture(params=["array", "numpy"])
+def float_backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(xbrl_to_json, "numpy", None)
+    return request.param
+
+def test_fact_arrays(filing_folder, float_backend):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    fact_arrays = xbrl_to_json.FactArrays(xbrl_to_json.return_fact_column_dict(root_node))
+    assert len(fact_arrays) == 7
+    if float_backend == "numpy":
+        assert isinstance(fact_arrays["value"], xbrl_to_json.numpy.ndarray)
+    else:
+        assert fact_arrays["value"].typecode == "d"
+    revenue = fact_arrays.filter_units(["USD"]).filter_concepts(["Revenues"])
+    assert len(revenue) == 5
+    assert sorted(revenue.scaled_values(1e-3)) == [250.0, 300.0, 600.0, 900.0, 1000.0]
+    assert len(fact_arrays.filter_units(["USD"], case_sensitive=True)) == 0
+    net_income = fact_arrays.filter_concepts(["NetIncomeLoss"])
+    assert list(net_income.sign_values()) == [-1.0]
+    assert list(net_income.signed_values(-1)) == [250000.0]
+    assert list(net_income.signed_values([1])) == [-250000.0]
+    assert list(fact_arrays["decimals"]) == [-3.0] * 7
+    assert len(fact_arrays.filter_units(["shares"])) == 0
@@ -0,0 +1,48 @@
+import os
+import xbrl_to_json
+from conftest import write_filing
+
+def return_facts_dict(folder_name, facts_only):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", folder_name, sic="1234", country_code="US", facts_only=facts_only)
+    return xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name)["abc"]
+
+def test_facts_only_matches_the_full_pipeline(tmp_path):
+    full_facts_dict = return_facts_dict(write_filing(str(tmp_path / "full" / "abc-20201231")), facts_only=False)
+    folder_name = write_filing(str(tmp_path / "facts_only" / "abc-20201231"))
+    facts_only_dict = return_facts_dict(folder_name, facts_only=True)
+    # the small filing has no .xsd or linkbase "list" entries, so everything matches
+    assert facts_only_dict == full_facts_dict
+    assert list(facts_only_dict) == ["Revenues", "NetIncomeLoss", "Assets"]
+    # no tree json or cache is written
+    json_filename = xbrl_to_json.return_xbrl_to_json_converted_filename_with_date(folder_name, "abc", "20201231")
+    assert not os.path.exists(json_filename)
+    assert not os.path.exists(xbrl_to_json.return_tree_cache_filename(json_filename))
+
+def test_facts_only_deletes_the_filing_files(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, facts_only=True, delete_files_after_import=True)
+    assert root_node is not None
+    assert not os.path.exists(filing_folder)
+
+def return_facts_dict_filename_list():
+    return [filename for filename in os.listdir(os.path.join("XBRL_Data", "abc", "10-K")) if filename.endswith("_facts_dict.json")]
+
+def test_facts_only_second_run_stays_local(fake_download):
+    assert xbrl_to_json.main_download_and_convert("abc", 1, "10-K", facts_only=True) is not None
+    facts_dict_filename_list = return_facts_dict_filename_list()
+    assert len(facts_dict_filename_list) == 1
+    assert xbrl_to_json.main_download_and_convert("abc", 1, "10-K", facts_only=True) is not None
+    assert len(fake_download) == 1
+    assert return_facts_dict_filename_list() == facts_dict_filename_list
+
+def test_facts_only_deleted_files_stay_local(fake_download):
+    xbrl_to_json.main_download_and_convert("abc", 1, "10-K", facts_only=True, delete_files_after_import=True)
+    data_date = return_facts_dict_filename_list()[0][len("abc-"):len("abc-") + 8]
+    # only the facts dict is left, so there's no tree to return, but nothing is downloaded either
+    assert xbrl_to_json.main_download_and_convert("abc", 1, "10-K", facts_only=True, delete_files_after_import=True) is None
+    assert xbrl_to_json.main_download_and_convert("abc", 1, "10-K", year=data_date[:4], month=data_date[4:6], day=data_date[6:], facts_only=True) is None
+    assert len(fake_download) == 1
+
+def test_full_conversion_still_needs_the_tree_json(fake_download):
+    xbrl_to_json.main_download_and_convert("abc", 1, "10-K", facts_only=True, delete_files_after_import=True)
+    xbrl_to_json.main_download_and_convert("abc", 1, "10-K")
+    assert len(fake_download) == 2
@@ -0,0 +1,38 @@
+import pytest
+import xbrl_to_json
+
+FY2020 = "2020-01-01:2020-12-31"
+US_MEMBER = "us-gaap_StatementGeographicalAxis_country_USMember"
+
+@pytest.fixture
+def root_node(filing_folder):
+    return xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+
+def test_get_data_node(root_node):
+    concept_node = xbrl_to_json.get_data_node(root_node, "Revenues")
+    assert concept_node.suffix == "Revenues" and concept_node.depth == 1
+    # FY2020 and two axis contexts share the period, the base one is used
+    assert xbrl_to_json.get_data_node(root_node, "Revenues", FY2020).fact == "1000000"
+    assert xbrl_to_json.get_data_node(root_node, "Revenues", FY2020, subcategory=US_MEMBER).fact == "600000"
+    assert xbrl_to_json.get_data_node(root_node, "Assets", "2020-12-31").fact == "5000000"
+    assert xbrl_to_json.get_data_node(root_node, "Revenues", FY2020, subcategory="NotAMember") is None
+    assert xbrl_to_json.get_data_node(root_node, "NotAConcept") is None
+
+def test_single_context_returns_the_fact_node(root_node):
+    # this used to return the contextRef string
+    fact_node = xbrl_to_json.get_data_node(root_node, "Revenues", "2019-01-01:2019-12-31")
+    assert fact_node.fact == "900000"
+    assert fact_node.attrib["contextRef"] == "FY2019"
+
+def test_missing_period_returns_none(root_node):
+    # this used to raise IndexError
+    assert xbrl_to_json.get_data_node(root_node, "Revenues", "2018-01-01:2018-12-31") is None
+
+def test_query_index_is_cached_per_tree(root_node, filing_folder):
+    query_index = xbrl_to_json.return_filing_query_index(root_node)
+    assert xbrl_to_json.return_filing_query_index(root_node) is query_index
+    assert query_index.return_period_context_refs(FY2020)[0] == "FY2020"
+    fact_node = xbrl_to_json.get_data_node(root_node, "Revenues", FY2020)
+    assert xbrl_to_json.get_data_node(root_node, "Revenues", FY2020, query_index=xbrl_to_json.FilingQueryIndex(root_node)) is fact_node
+    other_root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    assert xbrl_to_json.return_filing_query_index(other_root_node) is not query_index
@@ -0,0 +1,15 @@
+import anytree
+import xbrl_to_json
+
+def return_locator_count(root_node, concept):
+    return sum(1 for node in anytree.PreOrderIter(root_node)
+               if node.name == "loc" and node.attrib.get("{http://www.w3.org/1999/xlink}label") == "loc_us-gaap_{}".format(concept))
+
+def test_identical_elements_are_kept(filing_folder):
+    ''' the presentation linkbase has the Revenues locator twice, both stay under the concept (with the _lab.xml one),
+        as they always have: the old vars() duplicate check never matched
+    '''
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    revenues_node = [node for node in root_node.children if node.name == "Revenues"][0]
+    assert return_locator_count(revenues_node, "Revenues") == 3
+    assert return_locator_count(root_node, "NetIncomeLoss") == 2
@@ -0,0 +1,36 @@
+import json
+import pytest
+import xbrl_to_json
+
+FACTS_DICT = {"abc": {
+    "Revenues": {"2020-01-01:2020-12-31": "1000000", "StatementGeographicalAxis": {"USMember": {"2020-01-01:2020-12-31": "600000"}}},
+    "Assets": {"2020-12-31": "5000000", "list": ["a", "b"]},
+    "Empty": {},
+    "Number": 1.5,
+    }}
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(xbrl_to_json, "orjson", None)
+    elif xbrl_to_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+def test_written_json_matches_json_dump(tmp_path, json_backend):
+    json_filename = str(tmp_path / "abc_facts_dict.json")
+    xbrl_to_json.write_dict_as_json(FACTS_DICT, json_filename)
+    with open(json_filename, "rb") as inputfile:
+        assert inputfile.read() == json.dumps(FACTS_DICT, indent=2).encode()
+    xbrl_to_json.write_dict_as_json(FACTS_DICT, json_filename, compact=True)
+    with open(json_filename, "rb") as inputfile:
+        assert inputfile.read() == json.dumps(FACTS_DICT, separators=(",", ":")).encode()
+    assert xbrl_to_json.import_json(json_filename) == FACTS_DICT
+
+def test_facts_dict_streams_a_concept_at_a_time(json_backend):
+    chunk_list = [chunk for key_path, chunk in xbrl_to_json.iter_dict_json_chunks(FACTS_DICT)]
+    for concept, value in FACTS_DICT["abc"].items():
+        # each concept is encoded on its own, never inside a bigger piece
+        assert xbrl_to_json.return_json_bytes(value, level=2) in chunk_list
+    assert max(len(chunk) for chunk in chunk_list) == max(len(xbrl_to_json.return_json_bytes(value, level=2)) for value in FACTS_DICT["abc"].values())
+    assert list(xbrl_to_json.iter_dict_json_chunks(FACTS_DICT, stream_depth=0)) == [(None, json.dumps(FACTS_DICT, indent=2).encode())]
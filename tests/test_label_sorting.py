@@ -0,0 +1,38 @@
+import random
+import pytest
+import xbrl_to_json
+
+def old_label_suffix_rank(id_str, suffix_list):
+    ''' the old loop: the first suffix, in dict order, with "_{suffix}_" in the id '''
+    for rank, suffix_str in enumerate(suffix_list):
+        if "_{}_".format(suffix_str) in id_str:
+            return rank
+    return None
+
+def return_rank(id_str, suffix_list):
+    return xbrl_to_json.return_label_id_suffix_rank(id_str, {suffix_str: rank for rank, suffix_str in enumerate(suffix_list)})
+
+@pytest.mark.parametrize("id_str, suffix_list, rank", [
+    ("lab_us-gaap_Taxes_XYZ", ["Revenues", "Taxes"], 1),
+    # both match, the earlier one in the dict wins, not the earlier one in the id
+    ("lab_us-gaap_Taxes_Deferred_XYZ", ["Deferred", "Taxes"], 0),
+    ("lab_us-gaap_Taxes_Deferred_XYZ", ["Taxes", "Deferred"], 0),
+    # a suffix with an underscore in it
+    ("lab_us-gaap_Taxes_Deferred_XYZ", ["Revenues", "Taxes_Deferred", "Deferred"], 1),
+    ("lab_us-gaap_Taxes_Deferred_XYZ", ["us-gaap", "Taxes"], 0),
+    # the first and last tokens have no underscore on one side
+    ("lab_us-gaap_Taxes_XYZ", ["lab", "XYZ"], None),
+    ("lab_us-gaap_Taxes", ["Taxes"], None),
+    ("Taxes", ["Taxes"], None),
+    ])
+def test_label_suffix_rank(id_str, suffix_list, rank):
+    assert return_rank(id_str, suffix_list) == rank
+    assert old_label_suffix_rank(id_str, suffix_list) == rank
+
+def test_label_suffix_rank_matches_the_old_loop():
+    random_generator = random.Random(20)
+    token_list = ["lab", "us-gaap", "Taxes", "Deferred", "Revenues", "abc", "", "XYZ"]
+    for i in range(2000):
+        id_str = "_".join(random_generator.choice(token_list) for j in range(random_generator.randint(1, 6)))
+        suffix_list = list(dict.fromkeys("_".join(random_generator.choice(token_list) for j in range(random_generator.randint(1, 2))) for k in range(random_generator.randint(0, 5))))
+        assert return_rank(id_str, suffix_list) == old_label_suffix_rank(id_str, suffix_list), (id_str, suffix_list)
@@ -0,0 +1,53 @@
+import json, os
+import pytest
+import xbrl_to_json
+
+@pytest.fixture
+def facts_dict_filename(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder)
+    return "{}_facts_dict.json".format(filing_folder)
+
+def test_lazy_mapping_matches_json_load(facts_dict_filename):
+    with open(facts_dict_filename) as inputfile:
+        facts_dict = json.load(inputfile)
+    lazy_mapping = xbrl_to_json.import_facts_dict(facts_dict_filename, lazy=True)
+    assert isinstance(lazy_mapping, xbrl_to_json.LazyJsonMapping)
+    assert list(lazy_mapping.keys()) == list(facts_dict.keys())
+    assert len(lazy_mapping) == len(facts_dict)
+    concept_mapping = lazy_mapping["abc"]
+    assert list(concept_mapping.keys()) == list(facts_dict["abc"].keys())
+    assert len(concept_mapping) == len(facts_dict["abc"])
+    for concept, value in facts_dict["abc"].items():
+        assert concept_mapping[concept] == value
+    # decoded once, then kept
+    assert concept_mapping["Revenues"] is concept_mapping["Revenues"]
+    assert dict(concept_mapping) == facts_dict["abc"]
+    with pytest.raises(KeyError):
+        concept_mapping["NotAConcept"]
+    assert concept_mapping.get("NotAConcept") is None
+    assert "NotAConcept" not in concept_mapping
+    lazy_mapping.close()
+
+def test_stale_index_falls_back_to_the_full_dict(facts_dict_filename):
+    index_filename = xbrl_to_json.return_facts_dict_index_filename(facts_dict_filename)
+    with open(index_filename, "rb") as inputfile:
+        index_bytes = inputfile.read()
+    # the json is rewritten (here, compact) but the old index is put back
+    facts_dict = xbrl_to_json.import_json(facts_dict_filename)
+    xbrl_to_json.write_dict_as_json(facts_dict, facts_dict_filename, compact=True)
+    with open(index_filename, "wb") as outfile:
+        outfile.write(index_bytes)
+    assert xbrl_to_json.return_lazy_json_mapping(facts_dict_filename) is None
+    imported_facts_dict = xbrl_to_json.import_facts_dict(facts_dict_filename, lazy=True)
+    assert type(imported_facts_dict) is dict
+    assert imported_facts_dict == facts_dict
+
+def test_index_older_than_the_json_is_not_used(facts_dict_filename):
+    index_filename = xbrl_to_json.return_facts_dict_index_filename(facts_dict_filename)
+    json_time = os.path.getmtime(facts_dict_filename)
+    os.utime(index_filename, (json_time - 10, json_time - 10))
+    assert xbrl_to_json.return_lazy_json_mapping(facts_dict_filename) is None
+    os.remove(index_filename)
+    assert xbrl_to_json.return_lazy_json_mapping(facts_dict_filename) is None
+    assert type(xbrl_to_json.import_facts_dict(facts_dict_filename, lazy=True)) is dict
@@ -0,0 +1,84 @@
+import os, shutil, tracemalloc
+import pytest
+import xbrl_to_json
+
+SORTING_STAGE_LIST = ["initial_sorting", "deep_sorting", "second_pass", "context_ref_sorting", "context_dict"]
+
+def test_report_has_every_stage(filing_folder):
+    assert not tracemalloc.is_tracing()
+    profiler = xbrl_to_json.ConversionProfiler()
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US", profiler=profiler)
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder, profiler=profiler)
+    report_dict = profiler.finish()
+    assert not tracemalloc.is_tracing()
+
+    assert report_dict["ticker"] == "abc"
+    assert report_dict["date"] == "20201231"
+    stage_name_list = [stage_dict["stage"] for stage_dict in report_dict["stages"]]
+    assert stage_name_list == ["cache_load", "parsing", "parsing", "parsing"] + SORTING_STAGE_LIST + ["export", "fact_dict"]
+    assert sorted(stage_dict["file"] for stage_dict in report_dict["stages"] if stage_dict["stage"] == "parsing") == ["abc-20201231.xml", "abc-20201231_lab.xml", "abc-20201231_pre.xml"]
+    for stage_dict in report_dict["stages"]:
+        assert stage_dict["seconds"] >= 0
+        assert stage_dict["peak_memory_bytes"] > 0
+        assert "start" not in stage_dict
+    sorting_stage_dict_list = [stage_dict for stage_dict in report_dict["stages"] if stage_dict["stage"] in SORTING_STAGE_LIST]
+    assert all(set(stage_dict["node_counts"]) == {"facts", "other", "trash"} for stage_dict in sorting_stage_dict_list)
+    # the contexts are used up by the end
+    assert sorting_stage_dict_list[-1]["node_counts"]["trash"] > sorting_stage_dict_list[0]["node_counts"]["trash"]
+    assert report_dict["total_seconds"] >= sum(stage_dict["seconds"] for stage_dict in report_dict["stages"])
+
+def test_no_node_counts_without_a_profiler(filing_folder, monkeypatch):
+    def fail(root_node):
+        raise AssertionError("counted {}".format(root_node))
+    monkeypatch.setattr(xbrl_to_json, "return_tree_length", fail)
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    assert root_node.name == "abc"
+
+def test_count_nodes_off(filing_folder):
+    profiler = xbrl_to_json.ConversionProfiler(trace_memory=False, count_nodes=False)
+    xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US", profiler=profiler)
+    report_dict = profiler.finish()
+    assert report_dict["stages"]
+    assert not any("node_counts" in stage_dict or "peak_memory_bytes" in stage_dict for stage_dict in report_dict["stages"])
+
+def test_profile_reports_stay_out_of_the_filing_scan(fake_download):
+    profiler = xbrl_to_json.ConversionProfiler(trace_memory=False, write_file=True)
+    xbrl_to_json.main_download_and_convert("abc", 1, "10-K", profiler=profiler)
+    folder_path = os.path.join("XBRL_Data", "abc", "10-K")
+    folder_name = [filename for filename in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, filename)) and filename != "profiles"][0]
+    assert os.listdir(os.path.join(folder_path, "profiles")) == ["{}_profile.json".format(folder_name)]
+    # a report where they used to be written doesn't trip the scan either
+    shutil.copy(os.path.join(folder_path, "profiles", "{}_profile.json".format(folder_name)), folder_path)
+    root_node = xbrl_to_json.main_download_and_convert("abc", 1, "10-K", profiler=xbrl_to_json.ConversionProfiler(trace_memory=False, write_file=True))
+    assert root_node is not None
+    assert len(fake_download) == 1
+    assert profiler.report_dict["stages"]
+
+def test_tracing_starts_lazily_and_finish_is_idempotent(filing_folder):
+    profiler = xbrl_to_json.ConversionProfiler()
+    assert not tracemalloc.is_tracing()
+    xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US", profiler=profiler)
+    assert tracemalloc.is_tracing()
+    report_dict = profiler.finish()
+    assert not tracemalloc.is_tracing()
+    total_seconds = report_dict["total_seconds"]
+    assert profiler.finish() is report_dict
+    assert report_dict["total_seconds"] == total_seconds
+
+def test_context_manager_stops_tracing(filing_folder):
+    with pytest.raises(ValueError):
+        with xbrl_to_json.ConversionProfiler() as profiler:
+            xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US", profiler=profiler)
+            assert tracemalloc.is_tracing()
+            raise ValueError
+    assert not tracemalloc.is_tracing()
+    assert "total_seconds" in profiler.report_dict
+
+def test_failed_download_and_convert_stops_tracing(fake_download, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError("conversion failed")
+    monkeypatch.setattr(xbrl_to_json, "convert_root_node_facts_to_fact_dict", fail)
+    with pytest.raises(ValueError):
+        xbrl_to_json.main_download_and_convert("abc", 1, "10-K", profiler=xbrl_to_json.ConversionProfiler(write_file=True))
+    assert not tracemalloc.is_tracing()
+    assert not os.path.exists(os.path.join("XBRL_Data", "abc", "10-K", "profiles"))
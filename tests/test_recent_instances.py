@@ -0,0 +1,72 @@
+import datetime
+import anytree
+import pytest
+import xbrl_to_json
+
+CONTEXT_DICT = {
+    "FY2018YTD": "2018-01-01:2018-12-31",
+    "FY2019YTD": "2019-01-01:2019-12-31",
+    "FY2020YTD": "2020-01-01:2020-12-31",
+    "FY2020AgainYTD": "2020-01-01:2020-12-31",
+    "H1FY2020YTD": "2020-01-01:2020-06-30",
+    "I2019YTD": "2019-12-31",
+    "Q3FY2020Q3": "2020-07-01:2020-09-30",
+    "Q4FY2020Q4": "2020-10-01:2020-12-31",
+    }
+# (contextRef, fact) in document order
+FACT_LIST = [
+    ("FY2018YTD", "800"),
+    ("Q3FY2020Q3", "270"),
+    ("FY2019YTD", "900"),
+    ("H1FY2020YTD", "500"),
+    ("I2019YTD", "950"),
+    ("FY2020YTD", "1000"),
+    ("FY2020AgainYTD", "1000"),
+    ("Q4FY2020Q4", "300"),
+    ]
+
+@pytest.fixture
+def root_node():
+    root_node = anytree.Node("abc")
+    anytree.Node("context_dict", parent=root_node, attrib=CONTEXT_DICT)
+    concept_node = anytree.Node("Revenues", parent=root_node, suffix="Revenues")
+    for context_ref, fact in FACT_LIST:
+        anytree.Node("Revenues", parent=concept_node, suffix="Revenues", fact=fact, attrib={"contextRef": context_ref})
+    return root_node
+
+def return_facts(node_list):
+    return [(node.attrib["contextRef"], node.fact) for node in node_list]
+
+def test_period_table(root_node):
+    query_index = xbrl_to_json.FilingQueryIndex(root_node)
+    fy2020 = query_index.return_context_period("FY2020YTD")
+    assert fy2020 == (datetime.datetime(2020, 1, 1), datetime.datetime(2020, 12, 31), 365, "Y")
+    # one parse per distinct period
+    assert query_index.return_context_period("FY2020AgainYTD") is fy2020
+    assert query_index.return_context_period("Q4FY2020Q4").term == "Q"
+    assert query_index.return_context_period("H1FY2020YTD").term is None
+    assert query_index.return_context_period("I2019YTD") == (None, datetime.datetime(2019, 12, 31), None, None)
+    assert query_index.return_context_period("NotAContext") is None
+
+def test_most_recent_annual_instances(root_node):
+    most_recent_list = xbrl_to_json.get_most_recent_multiple_instances(root_node, "Revenues", 4, Y_or_Q="Y")
+    # the half year is skipped, the repeated 2020 fact counts once,
+    # the 2019 duration and instant share an end date, so document order decides
+    assert return_facts(most_recent_list) == [("FY2020YTD", "1000"), ("FY2019YTD", "900"), ("I2019YTD", "950"), ("FY2018YTD", "800")]
+    assert return_facts(xbrl_to_json.get_most_recent_multiple_instances(root_node, "Revenues", 2, Y_or_Q="Y")) == [("FY2020YTD", "1000"), ("FY2019YTD", "900")]
+
+def test_most_recent_quarterly_instances(root_node):
+    most_recent_list = xbrl_to_json.get_most_recent_multiple_instances(root_node, "Revenues", 5, Y_or_Q="Q")
+    assert return_facts(most_recent_list) == [("Q4FY2020Q4", "300"), ("Q3FY2020Q3", "270")]
+    assert xbrl_to_json.get_most_recent_multiple_instances(root_node, "NotAConcept", 5, Y_or_Q="Q") is None
+
+def test_impossible_dates_are_skipped(root_node):
+    context_dict_node = anytree.find_by_attr(root_node, "context_dict", maxlevel=2)
+    context_dict_node.attrib = dict(CONTEXT_DICT, FY2021YTD="2021-01-01:2021-02-30", I2021YTD="2021-02-30")
+    anytree.Node("Revenues", parent=root_node.children[-1], suffix="Revenues", fact="1100", attrib={"contextRef": "FY2021YTD"})
+    query_index = xbrl_to_json.FilingQueryIndex(root_node)
+    assert query_index.return_context_period("FY2021YTD") is None
+    assert query_index.return_context_period("I2021YTD") is None
+    assert query_index.return_context_period("FY2020YTD").term == "Y"
+    most_recent_list = xbrl_to_json.get_most_recent_multiple_instances(root_node, "Revenues", 1, Y_or_Q="Y", query_index=query_index)
+    assert return_facts(most_recent_list) == [("FY2020YTD", "1000")]
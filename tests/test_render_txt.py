@@ -0,0 +1,45 @@
+import anytree
+import xbrl_to_json
+
+def return_render_txt(filename):
+    with open("{}_render.txt".format(filename)) as inputfile:
+        return inputfile.read()
+
+def test_render_txt_matches_render_tree(filing_folder, tmp_path):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    filename = str(tmp_path / "render")
+    xbrl_to_json.root_node_to_rendertree_text_file(root_node, filename)
+    assert return_render_txt(filename) == str(anytree.RenderTree(root_node))
+
+    xbrl_to_json.root_node_to_rendertree_text_file(root_node, filename, max_depth=1)
+    assert return_render_txt(filename) == str(anytree.RenderTree(root_node, maxlevel=2))
+
+    full_render = str(anytree.RenderTree(root_node))
+    xbrl_to_json.root_node_to_rendertree_text_file(root_node, filename, max_chars=1000)
+    render_txt = return_render_txt(filename)
+    assert render_txt.endswith("\n... render cut off at 1000 characters")
+    cut_render = render_txt[:-len("\n... render cut off at 1000 characters")]
+    assert len(cut_render) <= 1000
+    assert full_render.startswith(cut_render)
+
+def test_custom_render_is_unchanged(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    # the old string concatenation version
+    output_str = ""
+    for pre, _, node in anytree.RenderTree(root_node):
+        fact = ""
+        formatted_fact = ""
+        attrib = ""
+        formatted_attrib = ""
+        try:
+            fact = node.fact
+            attrib = node.attrib
+        except:
+            pass
+        if fact:
+            formatted_fact = "\n{}{}".format(pre, fact)
+        if attrib:
+            formatted_attrib = "\n{}{}".format(pre, attrib)
+        formatted_str = "{}{}{}{}\n".format(pre, node.name, formatted_fact, formatted_attrib)
+        output_str = output_str + "\n" + formatted_str
+    assert xbrl_to_json.custom_render_tree(root_node) == output_str
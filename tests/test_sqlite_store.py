@@ -0,0 +1,89 @@
+import os, sqlite3
+import anytree
+import xbrl_to_json
+
+def return_table_row_dict(sqlite_filename):
+    connection = sqlite3.connect(sqlite_filename)
+    try:
+        return {table: sorted(connection.execute("SELECT * FROM {}".format(table)).fetchall(), key=repr)
+                for table in ["filings", "contexts", "units", "facts", "labels"]}
+    finally:
+        connection.close()
+
+def test_sqlite_round_trip(filing_folder, tmp_path):
+    sqlite_filename = str(tmp_path / "facts.sqlite")
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder, sqlite_filename=sqlite_filename, cik=1, form_type="10-K")
+    row_dict = return_table_row_dict(sqlite_filename)
+    assert row_dict["filings"] == [(1, "abc", "1", "1234", "US", "10-K", "20201231")]
+    assert len(row_dict["facts"]) == 7
+    assert row_dict["units"] == [(1, "usd")]
+    assert row_dict["labels"] == []
+
+    revenue_row_list = xbrl_to_json.query_sqlite_facts(sqlite_filename, "Revenues")
+    assert len(revenue_row_list) == 5
+    assert ("abc", "2020-01-01", "2020-12-31", "", "usd", -3.0, 1000000.0) in revenue_row_list
+    assert xbrl_to_json.query_sqlite_facts(sqlite_filename, "Assets", ticker_list=["abc"], period_end="2020-12-31") == [("abc", "", "2020-12-31", "", "usd", -3.0, 5000000.0)]
+    assert xbrl_to_json.query_sqlite_facts(sqlite_filename, "Assets", ticker_list=["xyz"]) == []
+
+    # storing the same filing again replaces it, nothing is doubled up or lost
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder, sqlite_filename=sqlite_filename, cik=1, form_type="10-K")
+    assert return_table_row_dict(sqlite_filename) == row_dict
+    # another form type is another filing
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder, sqlite_filename=sqlite_filename, cik=1, form_type="10-Q")
+    two_filing_row_dict = return_table_row_dict(sqlite_filename)
+    assert len(two_filing_row_dict["filings"]) == 2
+    assert len(two_filing_row_dict["facts"]) == 14
+    assert len(xbrl_to_json.query_sqlite_facts(sqlite_filename, "Revenues")) == 10
+
+def test_labels_are_replaced_too(filing_folder, tmp_path):
+    sqlite_filename = str(tmp_path / "facts.sqlite")
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    facts_dict = xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", filing_folder)["abc"]
+    facts_dict["Revenues"]["label"] = {"label": "Revenues", "terseLabel": "Revenue"}
+    filing_dict = xbrl_to_json.return_filing_dict(root_node, "abc", filing_folder, cik=1, form_type="10-K")
+    context_dict = anytree.findall_by_attr(root_node, "context_dict", maxlevel=2)[0].attrib
+    fact_column_dict = xbrl_to_json.return_fact_column_dict(root_node, context_dict)
+    for i in range(2):
+        xbrl_to_json.write_filing_to_sqlite(sqlite_filename, filing_dict, context_dict, fact_column_dict, facts_dict)
+        row_dict = return_table_row_dict(sqlite_filename)
+        assert row_dict["labels"] == [(1, "Revenues", "label", "Revenues"), (1, "Revenues", "terseLabel", "Revenue")]
+        assert len(row_dict["contexts"]) == len(context_dict)
+        assert len(row_dict["facts"]) == 7
+
+def test_upper_case_ticker_keeps_the_filing_date(fake_download):
+    xbrl_to_json.main_download_and_convert("ABC", 1, "10-K", sqlite_filename="facts.sqlite")
+    data_date = os.listdir(os.path.join("XBRL_Data", "ABC", "10-K"))[0][len("abc-"):len("abc-") + 8]
+    assert return_table_row_dict("facts.sqlite")["filings"] == [(1, "ABC", "1", "1234", "US", "10-K", data_date)]
+
+def test_filing_date(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    assert xbrl_to_json.return_filing_dict(root_node, "ABC", filing_folder)["date"] == "20201231"
+    assert xbrl_to_json.return_filing_dict(root_node, "abc", filing_folder, date=20210105)["date"] == "20210105"
+    assert xbrl_to_json.return_filing_dict(root_node, "abc", os.path.join(os.path.dirname(filing_folder), "abc-latest"))["date"] is None
+
+def test_filing_without_a_date_is_not_written(filing_folder, tmp_path):
+    sqlite_filename = str(tmp_path / "facts.sqlite")
+    folder_name = os.path.join(os.path.dirname(filing_folder), "abc-latest")
+    os.rename(filing_folder, folder_name)
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", folder_name, sic="1234", country_code="US")
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name, sqlite_filename=sqlite_filename, cik=1, form_type="10-K")
+    assert not os.path.exists(sqlite_filename)
+    # the date can still be given
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name, sqlite_filename=sqlite_filename, cik=1, form_type="10-K", filing_date="20201231")
+    assert [row[-1] for row in return_table_row_dict(sqlite_filename)["filings"]] == ["20201231"]
+
+def test_filing_converted_before_is_stored(fake_download):
+    root_node = xbrl_to_json.main_download_and_convert("abc", 1, "10-K")
+    assert not os.path.exists("facts.sqlite")
+    folder_path = os.path.join("XBRL_Data", "abc", "10-K")
+    folder_name = [os.path.join(folder_path, filename) for filename in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, filename))][0]
+    assert os.path.exists("{}_facts_dict.json".format(folder_name))
+    for i in range(2):
+        xbrl_to_json.main_download_and_convert("abc", 1, "10-K", sqlite_filename="facts.sqlite")
+        assert len(fake_download) == 1
+        row_dict = return_table_row_dict("facts.sqlite")
+        assert len(row_dict["filings"]) == 1
+    # the same rows a fresh conversion writes
+    xbrl_to_json.convert_root_node_facts_to_fact_dict(root_node, "abc", folder_name, sqlite_filename="fresh.sqlite", cik=1, form_type="10-K")
+    assert row_dict == return_table_row_dict("fresh.sqlite")
@@ -0,0 +1,18 @@
+import anytree
+import xbrl_to_json
+from conftest import write_filing
+
+def test_no_trash_tree_same_facts(filing_folder, tmp_path):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    no_trash_folder = write_filing(str(tmp_path / "no_trash" / "abc-20201231"))
+    no_trash_root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", no_trash_folder, sic="1234", country_code="US", keep_trash=False)
+    assert xbrl_to_json.convert_tree_to_dict(no_trash_root_node) == xbrl_to_json.convert_tree_to_dict(root_node)
+
+def test_keep_trash_sorted_groups_by_fingerprint():
+    trash_tree_root = anytree.Node("unsorted_trash")
+    first = anytree.Node("startDate", parent=trash_tree_root, suffix="startDate", fact="2020-01-01", attrib={}, parent_id="FY2020")
+    same = anytree.Node("startDate", parent=trash_tree_root, suffix="startDate", fact="2020-01-01", attrib={}, parent_id="FY2020")
+    other = anytree.Node("startDate", parent=trash_tree_root, suffix="startDate", fact="2019-01-01", attrib={}, parent_id="FY2019")
+    sorted_trash_tree_root = xbrl_to_json.keep_trash_sorted(trash_tree_root)
+    assert sorted_trash_tree_root.children == (first, other)
+    assert same.parent is first
@@ -0,0 +1,60 @@
+import os, marshal
+import anytree
+import xbrl_to_json
+
+def return_json_and_cache_filenames(filing_folder):
+    json_filename = xbrl_to_json.return_xbrl_to_json_converted_filename_with_date(filing_folder, "abc", "20201231")
+    return json_filename, xbrl_to_json.return_tree_cache_filename(json_filename)
+
+def return_render(root_node):
+    return str(anytree.RenderTree(root_node))
+
+def test_cache_round_trip_renders_the_same(filing_folder, monkeypatch):
+    xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    json_filename, cache_filename = return_json_and_cache_filenames(filing_folder)
+    assert os.path.isfile(cache_filename)
+    json_root_node = xbrl_to_json.convert_dict_to_node_tree(xbrl_to_json.import_json(json_filename))
+
+    def fail(dict_to_convert):
+        raise AssertionError("the json was loaded")
+    monkeypatch.setattr(xbrl_to_json, "convert_dict_to_node_tree", fail)
+    cached_root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    assert return_render(cached_root_node) == return_render(json_root_node)
+    assert xbrl_to_json.convert_tree_to_dict(cached_root_node) == xbrl_to_json.import_json(json_filename)
+    # and the tree cache can be written back out from a cached tree
+    os.remove(cache_filename)
+    xbrl_to_json.write_tree_cache(cached_root_node, cache_filename)
+    assert return_render(xbrl_to_json.import_tree_cache(cache_filename, json_filename)) == return_render(json_root_node)
+
+def test_unusable_cache_is_ignored(filing_folder):
+    xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    json_filename, cache_filename = return_json_and_cache_filenames(filing_folder)
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is not None
+    # older than the json
+    cache_time = os.path.getmtime(cache_filename)
+    os.utime(json_filename, (cache_time + 10, cache_time + 10))
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is None
+    os.utime(json_filename, (cache_time, cache_time))
+    # no json, no cache
+    os.remove(json_filename)
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is None
+
+def test_cache_with_another_key_is_ignored(filing_folder, monkeypatch):
+    xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    json_filename, cache_filename = return_json_and_cache_filenames(filing_folder)
+    with open(cache_filename, "rb") as inputfile:
+        assert inputfile.read(len(xbrl_to_json.TREE_CACHE_MAGIC)) == xbrl_to_json.TREE_CACHE_MAGIC
+        cache_key = inputfile.read(int.from_bytes(inputfile.read(2), "big"))
+        # plain data, a marshal of the key table, index bytes and values
+        key_tuple_list, parent_index_bytes, key_tuple_index_bytes, value_tuple_list = marshal.loads(inputfile.read())
+    assert cache_key == xbrl_to_json.return_tree_cache_key()
+    assert len(value_tuple_list) == len(list(anytree.PreOrderIter(xbrl_to_json.import_tree_cache(cache_filename, json_filename))))
+    # another layout version
+    monkeypatch.setattr(xbrl_to_json, "TREE_CACHE_VERSION", xbrl_to_json.TREE_CACHE_VERSION + 1)
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is None
+    monkeypatch.undo()
+    # another python, same key length
+    monkeypatch.setattr(xbrl_to_json, "return_tree_cache_key", lambda: cache_key.replace(b"python ", b"python_"))
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is None
+    monkeypatch.undo()
+    assert xbrl_to_json.import_tree_cache(cache_filename, json_filename) is not None
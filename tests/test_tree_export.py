@@ -0,0 +1,14 @@
+import json
+import anytree.exporter
+import xbrl_to_json
+
+def test_tree_dict_and_text_match_the_json_exporter(filing_folder):
+    root_node = xbrl_to_json.main_xbrl_to_json_converter("abc", 1, "20201231", filing_folder, sic="1234", country_code="US")
+    exporter = anytree.exporter.JsonExporter(dictexporter=xbrl_to_json.XbrlNodeDictExporter(), indent=2, sort_keys=True)
+    exported_dict = json.loads(exporter.export(root_node))
+    assert xbrl_to_json.convert_tree_to_dict(root_node) == exported_dict
+    assert b"".join(xbrl_to_json.iter_tree_json_chunks(root_node)) == json.dumps(exported_dict, indent=2).encode()
+    # and the parsed files, which are still XbrlNode trees
+    parsed_root_node = xbrl_to_json.process_xbrl_file_to_tree("{}/abc-20201231_lab.xml".format(filing_folder), "abc")
+    parsed_dict = json.loads(exporter.export(parsed_root_node))
+    assert b"".join(xbrl_to_json.iter_tree_json_chunks(parsed_root_node)) == json.dumps(parsed_dict, indent=2).encode()
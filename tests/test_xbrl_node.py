@@ -0,0 +1,18 @@
+import anytree
+import xbrl_to_json
+
+def test_repr_matches_anytree_node():
+    ''' the _render.txt files are RenderTree output, so the reprs have to match '''
+    xbrl_root = xbrl_to_json.XbrlNode("abc")
+    xbrl_node = xbrl_to_json.XbrlNode("Revenue", parent=xbrl_root, clark="http://fasb.org/us-gaap/2020", prefix="us-gaap", suffix="Revenue",
+                                      fact="1000", attrib={"contextRef": "FY2020", "unitRef": "usd"}, parent_id="FY2020")
+    node_root = anytree.Node("abc")
+    node = anytree.Node("Revenue", parent=node_root, clark="http://fasb.org/us-gaap/2020", prefix="us-gaap", suffix="Revenue",
+                        fact="1000", attrib={"contextRef": "FY2020", "unitRef": "usd"}, parent_id="FY2020")
+    assert repr(xbrl_node) == repr(node)
+    assert repr(xbrl_root) == repr(anytree.Node("abc", clark=None, prefix=None, suffix=None, fact="", attrib={}))
+
+def test_slots_defaults():
+    node = xbrl_to_json.XbrlNode("schemaRef")
+    assert (node.clark, node.prefix, node.suffix, node.fact, node.attrib, node.parent_id, node.axis) == (None, None, None, "", {}, None, False)
+    assert not hasattr(node, "__dict__") or not vars(node)
@@ -1,8 +1,24 @@
-import sys, os, shutil, logging, datetime, json, time, copy, re, random
+import sys, os, shutil, logging, datetime, json, time, copy, re, random, math, decimal, collections, collections.abc, tracemalloc, marshal, array, mmap, csv, sqlite3, weakref, heapq
 import urllib.request
+import concurrent.futures
 import bs4, anytree, anytree.exporter, anytree.importer
 import xml.etree.ElementTree as ET
 import pprint as pp
+try:
+    # optional, much faster json encoding/decoding, the stdlib json is used without it
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # optional, for the .npz columnar fact export
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    # optional, for the .parquet columnar fact export
+    import pyarrow, pyarrow.parquet
+except ImportError:
+    pyarrow = None
 logging.basicConfig(format='  ---- %(filename)s|%(lineno)d ----\n%(message)s', level=logging.INFO)
 
 clarks_to_ignore = ['http://www.w3.org/2001/XMLSchema',
@@ -12,6 +28,9 @@ clarks_to_ignore = ['http://www.w3.org/2001/XMLSchema',
                     ]
 unit_ref_list = []
 MONTH_IN_SECONDS = 60.0 * 60 * 24 * 7 * 30
+# context period terms, a duration of at least ANNUAL_PERIOD_MIN_DAYS is "Y", one within QUARTER_PERIOD_DAYS is "Q"
+ANNUAL_PERIOD_MIN_DAYS = 300
+QUARTER_PERIOD_DAYS = (60, 120)
 ANNUAL_FORM_TYPES = ["10-K", "20-F", "40-F"]
 PREFIXES_THAT_MATTER = ["us-gaap", "dei", "srt", "country", "stpr", "custom"]
 US_COUNTRY_CODES = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL",
@@ -19,54 +38,361 @@ US_COUNTRY_CODES = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL",
                     "NV", "NH", "NJ","NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD",
                     "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY", "X1", ]
 CANADA_COUNTRY_CODES = ["A0", "A1", "A2", "A3", "A4", "A5", "A6", "A7", "A8", "A9", "B0", "Z4",]
-
-
-
-
-def main_xbrl_to_json_converter(ticker, cik, date, folder_path, sic=None, country_code=None, delete_files_after_import=False):
+# binary tree cache, bump the version whenever the layout changes so old caches are rebuilt from the json
+# (the python and marshal versions are part of the cache key too, see return_tree_cache_key)
+TREE_CACHE_MAGIC = b"XBRLTREE"
+TREE_CACHE_VERSION = 2
+# sidecar byte range index of the facts dict json
+FACTS_DICT_INDEX_VERSION = 1
+# caps for the _render.txt debug files, None is no cap
+RENDER_TXT_MAX_DEPTH = None
+RENDER_TXT_MAX_CHARS = None
+# columnar fact export, the same columns (and types) for every filing
+FACT_COLUMN_LIST = [("concept", str),
+                    ("prefix", str),
+                    ("context_ref", str),
+                    ("period_start", str),
+                    ("period_end", str),
+                    ("instant", bool),
+                    ("dimensions", str),
+                    ("unit", str),
+                    ("decimals", float),
+                    ("value", float),
+                    ]
+FACT_COLUMN_FORMATS = ["csv", "npz", "parquet"]
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS filings (filing_id INTEGER PRIMARY KEY, ticker TEXT, cik TEXT, sic TEXT, country_code TEXT,
+                                    form_type TEXT, date TEXT, UNIQUE (ticker, form_type, date));
+CREATE TABLE IF NOT EXISTS contexts (filing_id INTEGER, context_ref TEXT, period_start TEXT, period_end TEXT, instant INTEGER,
+                                     PRIMARY KEY (filing_id, context_ref));
+CREATE TABLE IF NOT EXISTS units (filing_id INTEGER, unit_ref TEXT, PRIMARY KEY (filing_id, unit_ref));
+CREATE TABLE IF NOT EXISTS facts (filing_id INTEGER, ticker TEXT, concept TEXT, prefix TEXT, context_ref TEXT,
+                                  period_start TEXT, period_end TEXT, instant INTEGER, dimensions TEXT,
+                                  unit_ref TEXT, decimals REAL, value REAL);
+CREATE TABLE IF NOT EXISTS labels (filing_id INTEGER, concept TEXT, role TEXT, label TEXT);
+CREATE INDEX IF NOT EXISTS facts_ticker_concept_period_end ON facts (ticker, concept, period_end);
+CREATE INDEX IF NOT EXISTS facts_concept_period_end ON facts (concept, period_end);
+CREATE INDEX IF NOT EXISTS facts_filing_id ON facts (filing_id);
+CREATE INDEX IF NOT EXISTS labels_filing_id ON labels (filing_id);
+'''
+
+
+
+
+def main_xbrl_to_json_converter(ticker, cik, date, folder_path, sic=None, country_code=None, delete_files_after_import=False, parallel_workers=None, keep_trash=True, profiler=None, compact_json=False, facts_only=False):
+    ''' profiler is an optional ConversionProfiler, the stages here are added to it but it is left running,
+        the caller finishes it (main_download_and_convert does, after the facts dict stages)
+    '''
     root_node_dict = {}
     potential_json_filename = return_xbrl_to_json_converted_filename_with_date(folder_path, ticker, date)
+    if profiler:
+        profiler.report_dict["ticker"] = ticker
+        profiler.report_dict["date"] = str(date)
+    if facts_only:
+        ''' just the instance and the labels, when only the facts dict is needed '''
+        stage_dict = start_profile_stage(profiler, "facts_only_parsing")
+        root_node = facts_only_xbrl_processor(ticker, folder_path, sic, country_code)
+        end_profile_stage(profiler, stage_dict, facts=root_node)
+        if delete_files_after_import:
+            delete_xbrl_folder(folder_path)
+        return root_node
     # logging.info(potential_json_filename)
     ''' first we try to import the json files'''
-    try:
-        root_json = import_json(potential_json_filename)
-        root_node = convert_dict_to_node_tree(root_json)
-    except Exception as e:
-        logging.error(e)
-        root_node = None
+    stage_dict = start_profile_stage(profiler, "cache_load")
+    tree_cache_filename = return_tree_cache_filename(potential_json_filename)
+    root_node = import_tree_cache(tree_cache_filename, potential_json_filename)
+    if root_node is None:
+        try:
+            root_json = import_json(potential_json_filename)
+            root_node = convert_dict_to_node_tree(root_json)
+        except Exception as e:
+            logging.error(e)
+            root_node = None
+        if root_node:
+            # next time the binary cache will be there
+            write_tree_cache(root_node, tree_cache_filename)
+    end_profile_stage(profiler, stage_dict)
     ''' if we don't have the root node, we need to get it from the actual files '''
     if not root_node:
         logging.info("json file does not already exist, creating one...")
         list_of_filenames_in_directory = os.listdir(folder_path)
-        ''' we're going to iterate through the relevant xml/xsd files '''
-        for filename in list_of_filenames_in_directory:
-            if filename.endswith(".xml") or filename.endswith(".xsd"):
+        xbrl_filename_list = [filename for filename in list_of_filenames_in_directory if filename.endswith(".xml") or filename.endswith(".xsd")]
+        if parallel_workers:
+            ''' the files are independent, so they can be parsed in worker processes '''
+            # worker memory isn't traced, so this is one stage for all the files
+            stage_dict = start_profile_stage(profiler, "parsing", files=xbrl_filename_list, parallel_workers=parallel_workers)
+            root_node_dict = parallel_xbrl_to_json_processor(folder_path, xbrl_filename_list, ticker, parallel_workers, write_file=testing_write_file)
+            end_profile_stage(profiler, stage_dict, **root_node_dict)
+        else:
+            ''' we're going to iterate through the relevant xml/xsd files '''
+            for filename in xbrl_filename_list:
                 xbrl_filename = os.path.join(folder_path, filename)
                 logging.info("processing xbrl file: {}".format(xbrl_filename))
                 ''' here we generate the root node '''
+                stage_dict = start_profile_stage(profiler, "parsing", file=filename)
                 root_node = xbrl_to_json_processor(xbrl_filename, ticker, write_file=testing_write_file, write_txt_file=testing_write_file)
+                end_profile_stage(profiler, stage_dict, **{filename: root_node})
                 logging.info("done")
                 root_node_dict[filename] = root_node
         ''' here we build up the whole tree '''
-        fact_tree_root = fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code)
+        fact_tree_root = fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, keep_trash=keep_trash, profiler=profiler)
         write_txt_file = not delete_files_after_import # if we're deleting files, lets not save a render.txt file
         ''' here get the root of the whole tree '''
-        root_node = xbrl_to_json_processor(potential_json_filename, ticker, root_node=fact_tree_root, write_file=True, write_txt_file=write_txt_file)
+        stage_dict = start_profile_stage(profiler, "export")
+        root_node = xbrl_to_json_processor(potential_json_filename, ticker, root_node=fact_tree_root, write_file=True, write_txt_file=write_txt_file, compact_json=compact_json)
+        write_tree_cache(root_node, tree_cache_filename)
+        end_profile_stage(profiler, stage_dict)
         ''' this is an important ^^^ function '''
 
     if delete_files_after_import:
-        if os.path.isdir(folder_path):
-            shutil.rmtree(folder_path)
-            potential_txt_file = "{}.json_render.txt".format(folder_path)
-            if os.path.isfile(potential_txt_file):
-                os.remove(potential_txt_file)
+        delete_xbrl_folder(folder_path)
     return root_node
-def return_refernce_node(node, fact_tree_root, other_tree_root, ticker):
+def delete_xbrl_folder(folder_path):
+    if os.path.isdir(folder_path):
+        shutil.rmtree(folder_path)
+        potential_txt_file = "{}.json_render.txt".format(folder_path)
+        if os.path.isfile(potential_txt_file):
+            os.remove(potential_txt_file)
+def facts_only_xbrl_processor(ticker, folder_path, sic=None, country_code=None):
+    ''' the facts dict only needs part of the tree: the concept nodes with their facts (under Axis/Member
+        subparents), the labels, and the context_dict, sic and country_code nodes.
+        this builds just that, streaming the instance and _lab.xml, _def, _cal, _pre and the .xsd are skipped.
+        the concept entries come out the same as the full pipeline's, but the "list" entries of .xsd and linkbase
+        nodes (and the context explicitMembers, which the full pipeline sorts by the linkbases) won't be there.
+    '''
+    fact_tree_root = anytree.Node(ticker)
+    concept_node_dict = {}
+    context_dict = {}
+    label_node_list = []
+    xml_filename_list = [filename for filename in os.listdir(folder_path) if filename.endswith(".xml")]
+    # the instance first, so the concept order follows the facts
+    xml_filename_list.sort(key=lambda filename: filename.endswith("_lab.xml"))
+    for filename in xml_filename_list:
+        xbrl_filename = os.path.join(folder_path, filename)
+        if filename.endswith("_lab.xml"):
+            stream_label_file(xbrl_filename, fact_tree_root, concept_node_dict, label_node_list)
+        elif not any(filename.endswith(linkbase_ending) for linkbase_ending in ["_def.xml", "_cal.xml", "_pre.xml"]):
+            stream_instance_file(xbrl_filename, fact_tree_root, concept_node_dict, context_dict)
+    label_root = anytree.Node("label", parent=fact_tree_root, suffix="label")
+    for label_node in label_node_list:
+        label_node.parent = label_root
+    axis_subparent_dict = {}
+    for concept_node in concept_node_dict.values():
+        for node in list(concept_node.children):
+            replacement_parent = return_new_parent_for_Axis_contextRefs(node, axis_subparent_dict)
+            if replacement_parent:
+                node.parent = replacement_parent
+    context_dict_node = anytree.Node("context_dict", parent=fact_tree_root, attrib = context_dict)
+    context_sic_node = anytree.Node("sic", parent=fact_tree_root, attrib = sic)
+    context_country_code_node = anytree.Node("country_code", parent=fact_tree_root, attrib = country_code)
+    return fact_tree_root
+def return_concept_node(suffix, fact_tree_root, concept_node_dict):
+    concept_node = concept_node_dict.get(suffix)
+    if concept_node is None:
+        concept_node = anytree.Node(suffix, parent=fact_tree_root, suffix=suffix)
+        concept_node_dict[suffix] = concept_node
+    return concept_node
+def stream_instance_file(xbrl_filename, fact_tree_root, concept_node_dict, context_dict):
+    ''' adds the facts (elements with a contextRef) under their concept nodes, and the periods to context_dict,
+        the same "start:end" or instant strings convert_context_refs_into_id_keyed_dict makes.
+        files that aren't an xbrl instance are skipped.
+    '''
+    logging.info("processing instance file: {}".format(xbrl_filename))
+    ns = {}
+    reversed_ns = {}
+    xbrl_root_element = None
+    context_id = None
+    period_dict = collections.OrderedDict()
+    depth = 0
+    try:
+        for event, item in ET.iterparse(xbrl_filename, ['start-ns', 'start', 'end']):
+            if event == 'start-ns':
+                name, value = item
+                if name:
+                    ns[name] = value
+                    reversed_ns = {value: key for key, value in ns.items()}
+            elif event == 'start':
+                if xbrl_root_element is None:
+                    if item.tag != "{http://www.xbrl.org/2003/instance}xbrl":
+                        return
+                    xbrl_root_element = item
+                elif item.tag == "{http://www.xbrl.org/2003/instance}context":
+                    context_id = item.attrib.get("id")
+                depth += 1
+            elif event == 'end':
+                depth -= 1
+                fact = item.text
+                if isinstance(fact, str):
+                    fact = fact.strip()
+                if item.tag in ["{http://www.xbrl.org/2003/instance}startDate",
+                                "{http://www.xbrl.org/2003/instance}endDate",
+                                "{http://www.xbrl.org/2003/instance}instant"]:
+                    if context_id and fact:
+                        period_dict.setdefault(context_id, {})[xbrl_ns_suffix(item)] = fact
+                elif "contextRef" in item.attrib:
+                    clark, prefix, suffix = xbrl_clark_prefix_and_suffix(item, reversed_ns)
+                    concept_node = return_concept_node(suffix, fact_tree_root, concept_node_dict)
+                    XbrlNode(suffix,
+                             parent    = concept_node,
+                             clark     = clark,
+                             prefix    = prefix,
+                             suffix    = suffix,
+                             fact      = fact or "",
+                             attrib    = dict(item.attrib),
+                             )
+                if depth == 1:
+                    # done with this top level element
+                    item.clear()
+                    xbrl_root_element.remove(item)
+    except Exception as e:
+        logging.error(e)
+    for context_id, period in period_dict.items():
+        if "instant" in period:
+            context_dict[context_id] = period["instant"]
+        else:
+            context_dict[context_id] = ":".join([period[key] for key in ["startDate", "endDate"] if key in period])
+def stream_label_file(xbrl_filename, fact_tree_root, concept_node_dict, label_node_list):
+    ''' label resources become label nodes (like the full tree's), and every concept a loc points at
+        gets a concept node, so labels of concepts without facts still have somewhere to go
+    '''
+    logging.info("processing label file: {}".format(xbrl_filename))
+    ns = {}
+    reversed_ns = {}
+    try:
+        for event, item in ET.iterparse(xbrl_filename, ['start-ns', 'end']):
+            if event == 'start-ns':
+                name, value = item
+                if name:
+                    ns[name] = value
+                    reversed_ns = {value: key for key, value in ns.items()}
+                continue
+            clark, prefix, suffix = xbrl_clark_prefix_and_suffix(item, reversed_ns)
+            if suffix == "loc":
+                locator = return_xlink_locator(item)
+                if locator:
+                    # us-gaap_Revenues -> Revenues
+                    return_concept_node(locator.split("_", 1)[-1], fact_tree_root, concept_node_dict)
+            elif suffix == "label":
+                fact = item.text
+                if isinstance(fact, str):
+                    fact = fact.strip()
+                if fact:
+                    label_node_list.append(XbrlNode(suffix,
+                                                    clark     = clark,
+                                                    prefix    = prefix,
+                                                    suffix    = suffix,
+                                                    fact      = fact,
+                                                    attrib    = dict(item.attrib),
+                                                    ))
+            if suffix in ["loc", "label", "labelArc"]:
+                item.clear()
+    except Exception as e:
+        logging.error(e)
+class ConversionProfiler:
+    ''' structured per filing report of the conversion stages: wall time, node counts and peak traced memory
+
+        pass one in as profiler=... and read report_dict afterwards, or set write_file=True and
+        main_download_and_convert saves it as profiles/<folder>_profile.json beside the filing folders.
+        tracemalloc slows everything down quite a bit, trace_memory=False skips it.
+        the node counts are full walks of each tree after a stage, count_nodes=False skips them.
+
+        tracing starts with the first stage and runs until finish(), main_download_and_convert calls it for you,
+        anywhere else use it as a context manager (with ConversionProfiler() as profiler: ...) or call finish() yourself.
+    '''
+    def __init__(self, trace_memory=True, write_file=False, count_nodes=True):
+        self.trace_memory = trace_memory
+        self.write_file = write_file
+        self.count_nodes = count_nodes
+        self.report_dict = {"ticker": None, "date": None, "stages": []}
+        self.start_time = time.perf_counter()
+        self.started_tracemalloc = False
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish()
+        return False
+    def start_stage(self, stage_name, **details):
+        stage_dict = {"stage": stage_name}
+        stage_dict.update(details)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+            tracemalloc.reset_peak()
+        stage_dict["start"] = time.perf_counter()
+        return stage_dict
+    def end_stage(self, stage_dict, **root_nodes):
+        ''' root_nodes are counted after the timing and memory are taken, so they don't skew them '''
+        stage_dict["seconds"] = round(time.perf_counter() - stage_dict.pop("start"), 6)
+        if self.trace_memory:
+            stage_dict["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        if root_nodes and self.count_nodes:
+            stage_dict["node_counts"] = {name: return_tree_length(root_node) for name, root_node in root_nodes.items()}
+        self.report_dict["stages"].append(stage_dict)
+    def finish(self):
+        if "total_seconds" in self.report_dict:
+            return self.report_dict
+        self.report_dict["total_seconds"] = round(time.perf_counter() - self.start_time, 6)
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+        return self.report_dict
+def start_profile_stage(profiler, stage_name, **details):
+    if profiler is None:
+        return None
+    return profiler.start_stage(stage_name, **details)
+def end_profile_stage(profiler, stage_dict, **root_nodes):
+    ''' root_nodes are only handed on, the profiler counts them, so with no profiler no tree is walked '''
+    if profiler is None:
+        return
+    profiler.end_stage(stage_dict, **root_nodes)
+def finish_profile(profiler, folder_name):
+    if profiler is None:
+        return
+    report_dict = profiler.finish()
+    if profiler.write_file:
+        write_dict_as_json(report_dict, return_profile_filename(folder_name))
+def return_profile_filename(folder_name):
+    ''' the reports go in a profiles/ folder next to the filings, so the most recent filing scan never sees them '''
+    profile_folder = os.path.join(os.path.dirname(folder_name), "profiles")
+    os.makedirs(profile_folder, exist_ok=True)
+    return os.path.join(profile_folder, "{}_profile.json".format(os.path.basename(folder_name)))
+def parallel_xbrl_to_json_processor(folder_path, xbrl_filename_list, ticker, parallel_workers, write_file=False):
+    ''' runs xbrl_to_json_processor for each file in a process pool,
+        the XbrlNode trees are picklable, so the parsed roots come straight back to us
+    '''
+    root_node_dict = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parallel_workers) as executor:
+        future_dict = {}
+        for filename in xbrl_filename_list:
+            xbrl_filename = os.path.join(folder_path, filename)
+            logging.info("processing xbrl file: {}".format(xbrl_filename))
+            future_dict[filename] = executor.submit(xbrl_to_json_processor, xbrl_filename, ticker, write_file=write_file, write_txt_file=write_file)
+        ''' keep the directory order, fact_centric_xbrl_processor depends on it for the primary file '''
+        for filename in xbrl_filename_list:
+            root_node_dict[filename] = future_dict[filename].result()
+    logging.info("done")
+    return root_node_dict
+def return_name_to_node_dict(root_node):
+    ''' first node (pre-order) for each name, same as anytree.search.find_by_attr would give '''
+    name_to_node_dict = {}
+    for tree_node in anytree.PreOrderIter(root_node):
+        if tree_node.name not in name_to_node_dict:
+            name_to_node_dict[tree_node.name] = tree_node
+    return name_to_node_dict
+def return_refernce_node(node, fact_tree_root, other_tree_root, ticker, reference_node_dict=None, xbrli_node_dict=None):
     ''' we create a refernce node for the underlying node if it doesn't exist,
         this will act as a parent node, since many nodes are related, but not directly.
         Note that this will be a "parent node" in the sense that...
         well, in the sense that it's a folder that contains related items
+
+        reference_node_dict and xbrli_node_dict are name -> node indexes of the two roots,
+        if given, they are used instead of searching the trees, and are kept up to date here
     '''
+    if reference_node_dict is None:
+        reference_node_dict = return_name_to_node_dict(fact_tree_root)
+    if xbrli_node_dict is None:
+        xbrli_node_dict = return_name_to_node_dict(other_tree_root)
     local_prefixes_that_matter = PREFIXES_THAT_MATTER + [ticker.lower()]
 
     reference_node = None
@@ -93,9 +419,9 @@ def return_refernce_node(node, fact_tree_root, other_tree_root, ticker):
 
         ''' next we look for a potential existing parent/reference node by name '''
         if modified_locator:
-            reference_node = anytree.search.find_by_attr(fact_tree_root, modified_locator)
+            reference_node = reference_node_dict.get(modified_locator)
         else:
-            reference_node = anytree.search.find_by_attr(fact_tree_root, locator)
+            reference_node = reference_node_dict.get(locator)
 
         ''' if there is not a parent/reference node, we make one '''
         if not reference_node:
@@ -114,6 +440,7 @@ def return_refernce_node(node, fact_tree_root, other_tree_root, ticker):
                 reference_node = anytree.Node(locator,
                                          parent=fact_tree_root,
                                          suffix=locator)
+            reference_node_dict[reference_node.name] = reference_node
         ''' i'm going to try and associate the type of fact with the
             reference node
         '''
@@ -145,17 +472,26 @@ def return_refernce_node(node, fact_tree_root, other_tree_root, ticker):
         ''' this is a contextual item
             we will put this item in to the "other tree root" tree and deal with it later
         '''
-        xbrli_node = anytree.search.find_by_attr(other_tree_root, "{{{}}}{}".format(node.clark, node.suffix))
+        xbrli_node = xbrli_node_dict.get("{{{}}}{}".format(node.clark, node.suffix))
         if not xbrli_node:
             xbrli_node = anytree.Node("{{{}}}{}".format(node.clark, node.suffix),
                                      parent=other_tree_root,
                                      suffix=node.suffix)
+            xbrli_node_dict[xbrli_node.name] = xbrli_node
         return xbrli_node
-def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_trash_for_debugging=False):
+def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_trash_for_debugging=False, keep_trash=True, profiler=None):
+    ''' keep_trash=False drops used up nodes (the contexts) outright, rather than keeping them in a trash tree
+        profiler is an optional ConversionProfiler, each stage is added to its report
+    '''
     fact_tree_root = anytree.Node(ticker)
     other_tree_root = anytree.Node('xbrli')
-    trash_tree_root = anytree.Node('unsorted_trash')
+    trash_tree_root = None
+    if keep_trash:
+        trash_tree_root = anytree.Node('unsorted_trash')
     parent_child_tuple_list = []
+    ''' name -> node indexes, so finding a reference node doesn't mean searching the whole tree '''
+    reference_node_dict = {fact_tree_root.name: fact_tree_root}
+    xbrli_node_dict = {other_tree_root.name: other_tree_root}
 
     '''Here i'm going to attempt to order the files, to facilitate normal order:'''
     extension_order_after_primary_file_list = [".xsd", "_lab.xml",  "_def.xml",  "_cal.xml", "_pre.xml"]
@@ -174,6 +510,7 @@ def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_
     '''
     logging.info("Start initial sorting:")
     start_time = time.time()
+    stage_dict = start_profile_stage(profiler, "initial_sorting")
     for filename in ordered_filename_list:
         logging.info(filename)
         ''' grab the root node '''
@@ -191,30 +528,22 @@ def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_
                 why: we're trying to prevent dublicates
                 now let's pair it with that node
             '''
-            reference_node = return_refernce_node(node, fact_tree_root, other_tree_root, ticker)
+            reference_node = return_refernce_node(node, fact_tree_root, other_tree_root, ticker, reference_node_dict, xbrli_node_dict)
             parent_child_tuple_list.append((reference_node, node))
 
-    ''' we iterate through, check for duplicates'''
+    ''' we iterate through, and attach every node to its reference node.
+        this used to check each child for duplicates, vars(child) == vars(existing_child) against every existing child,
+        but vars() includes the anytree parent link: the existing children hang under reference_node, and child is still
+        under its parent in the parsed file (reference nodes are never parsed nodes), so the check never matched.
+        all it did was scan the children for every node. identical elements (repeated locators, roleRefs) are kept.
+    '''
     for reference_node, child in parent_child_tuple_list:
-        ''' now lets unite all these nodes together '''
-        unique = True
-        ''' here we go through to check for duplicates '''
-        for existing_child in reference_node.children:
-            if vars(child) == vars(existing_child):
-                '''this prevents lots of redundant nodes'''
-                unique = False
-            if unique == False:
-                break
-        if unique == True:
-            ''' if we have a unique parent child relationship, we map it
-                that is we attach the parent/reference node as the parent of our node
-            '''
-            child.parent = reference_node
-
-        else:
-            ''' here, our node is a duplicate, and so we throw it out '''
-            child.parent = trash_tree_root
+        ''' now lets unite all these nodes together,
+            that is we attach the parent/reference node as the parent of our node
+        '''
+        child.parent = reference_node
     ''' at this point we should have a basic tree structure with the base as the ticker'''
+    end_profile_stage(profiler, stage_dict, facts=fact_tree_root, other=other_tree_root, trash=trash_tree_root)
     print_root_node_lengths(fact_tree_root, other_tree_root, trash_tree_root)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
@@ -222,13 +551,17 @@ def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_
     ''' now let's need to pair more of the other refernces with our facts'''
     logging.info("Start deep sorting:")
     start_time = time.time()
+    stage_dict = start_profile_stage(profiler, "deep_sorting")
     ''' make a quick sort dict '''
     fact_tree_children_dict = {node.suffix: node for node in fact_tree_root.children}
+    ''' and a label/id -> node index, so we don't have to search every subtree for each node '''
+    label_and_id_index = LabelAndIdIndex(fact_tree_root, other_tree_root, fact_tree_children_dict)
     ''' got to the other other_tree_root and try to pair the stuff left over '''
     for node in anytree.PreOrderIter(other_tree_root):
-        replacement_parent = return_new_parent(node, fact_tree_children_dict)
+        replacement_parent = return_new_parent(node, fact_tree_children_dict, label_and_id_index)
         if replacement_parent:
             node.parent = replacement_parent
+    end_profile_stage(profiler, stage_dict, facts=fact_tree_root, other=other_tree_root, trash=trash_tree_root)
     print_root_node_lengths(fact_tree_root, other_tree_root, trash_tree_root)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
@@ -237,29 +570,36 @@ def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_
     #fact_tree_children_dict = {node.suffix: node for node in fact_tree_root.children}
     logging.info("Start deep sorting second pass:")
     start_time = time.time()
+    stage_dict = start_profile_stage(profiler, "second_pass")
     for node in anytree.PreOrderIter(other_tree_root):
-        replacement_parent = return_new_parent_round_two(node, fact_tree_children_dict)
+        replacement_parent = return_new_parent_round_two(node, fact_tree_children_dict, label_and_id_index)
         if replacement_parent:
             node.parent = replacement_parent
+    end_profile_stage(profiler, stage_dict, facts=fact_tree_root, other=other_tree_root, trash=trash_tree_root)
     print_root_node_lengths(fact_tree_root, other_tree_root, trash_tree_root)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
     logging.info("Start contextRef sorting:")
     start_time = time.time()
+    stage_dict = start_profile_stage(profiler, "context_ref_sorting")
+    axis_subparent_dict = {}
     for node in anytree.PreOrderIter(fact_tree_root):
-        replacement_parent = return_new_parent_for_Axis_contextRefs(node)
+        replacement_parent = return_new_parent_for_Axis_contextRefs(node, axis_subparent_dict)
         if replacement_parent:
             node.parent = replacement_parent
+    end_profile_stage(profiler, stage_dict, facts=fact_tree_root, other=other_tree_root, trash=trash_tree_root)
     print_root_node_lengths(fact_tree_root, other_tree_root, trash_tree_root)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
     logging.info("Create context refs dict:")
     start_time = time.time()
+    stage_dict = start_profile_stage(profiler, "context_dict")
     convert_context_refs_into_id_keyed_dict(fact_tree_root, other_tree_root, trash_tree_root, sic, country_code)
+    end_profile_stage(profiler, stage_dict, facts=fact_tree_root, other=other_tree_root, trash=trash_tree_root)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
 
-    if sort_trash_for_debugging:
+    if sort_trash_for_debugging and trash_tree_root is not None:
         logging.info("Sort trash file:")
         start_time = time.time()
         trash_tree_root = keep_trash_sorted(trash_tree_root)
@@ -274,13 +614,14 @@ def fact_centric_xbrl_processor(root_node_dict, ticker, sic, country_code, sort_
         root_node_to_rendertree_text_file(fact_tree_root, fact_tree_root_filename)
         other_tree_root_filename = ticker + "_xbrli"
         root_node_to_rendertree_text_file(other_tree_root, other_tree_root_filename)
-        trash_filename = ticker + "_trash"
-        root_node_to_rendertree_text_file(trash_tree_root, trash_filename)
+        if trash_tree_root is not None:
+            trash_filename = ticker + "_trash"
+            root_node_to_rendertree_text_file(trash_tree_root, trash_filename)
     logging.info("Finished in {}sec".format(round(time.time() - start_time)))
 
     return fact_tree_root
 def convert_context_refs_into_id_keyed_dict(fact_tree_root, other_tree_root, trash_tree_root, sic, country_code):
-    'converts contexts refs into a dict, and adds country code and sic'
+    'converts contexts refs into a dict, and adds country code and sic, used up nodes are detached if trash_tree_root is None'
     context_node = None
     period_node_list = []
     for child in list(other_tree_root.children):
@@ -292,10 +633,10 @@ def convert_context_refs_into_id_keyed_dict(fact_tree_root, other_tree_root, tra
     context_dict = {}
     for period_node in period_node_list:
         for node in anytree.PreOrderIter(period_node):
-            try:
-                existing_entry = context_dict.get(node.parent_id)
-            except:
+            parent_id = getattr(node, "parent_id", None)
+            if parent_id is None:
                 continue
+            existing_entry = context_dict.get(parent_id)
             if node.parent.suffix == "measure":
                 continue
             if existing_entry is None:
@@ -316,27 +657,35 @@ def convert_context_refs_into_id_keyed_dict(fact_tree_root, other_tree_root, tra
     context_sic_node = anytree.Node("sic", parent=fact_tree_root, attrib = sic)
     context_country_code_node = anytree.Node("country_code", parent=fact_tree_root, attrib = country_code)
 def keep_trash_sorted(trash_tree_root):
+    ''' regroups the trash, duplicates (same fingerprint) go under the first node like them '''
     sorted_trash_tree_root = anytree.Node('trash')
-    for node in anytree.PreOrderIter(trash_tree_root):
-        success = False
+    fingerprint_node_dict = {}
+    for node in list(anytree.PreOrderIter(trash_tree_root)):
         if node.parent:
-            for sorted_node in anytree.PreOrderIter(sorted_trash_tree_root):
-                if sorted_node.parent:
-                    if vars(node) == vars(sorted_node):
-                        success = True
-                        node.parent = sorted_node
-                        break
-            if not success:
+            fingerprint = return_node_fingerprint(node)
+            sorted_node = fingerprint_node_dict.get(fingerprint)
+            if sorted_node:
+                node.parent = sorted_node
+            else:
+                fingerprint_node_dict[fingerprint] = node
                 node.parent = sorted_trash_tree_root
-    logging.info("old trash tree")
-    logging.info(anytree.RenderTree(trash_tree_root))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("old trash tree")
+        logging.debug(anytree.RenderTree(trash_tree_root))
     return sorted_trash_tree_root
 def print_root_node_lengths(fact_tree_root, other_tree_root, trash_tree_root):
-    fact_tree_root_len = len(list(anytree.PreOrderIter(fact_tree_root)))
-    other_tree_root_len = len(list(anytree.PreOrderIter(other_tree_root)))
-    trash_tree_root_len = len(list(anytree.PreOrderIter(trash_tree_root)))
-    logging.info("facts:\t{}\tother:\t{}\ttrash:\t{}".format(fact_tree_root_len, other_tree_root_len, trash_tree_root_len))
-def return_new_parent(node, fact_tree_children_dict):
+    ''' full tree walks just for a log line, so only at the DEBUG level '''
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    fact_tree_root_len = return_tree_length(fact_tree_root)
+    other_tree_root_len = return_tree_length(other_tree_root)
+    trash_tree_root_len = return_tree_length(trash_tree_root)
+    logging.debug("facts:\t{}\tother:\t{}\ttrash:\t{}".format(fact_tree_root_len, other_tree_root_len, trash_tree_root_len))
+def return_tree_length(root_node):
+    if root_node is None:
+        return 0
+    return sum(1 for node in anytree.PreOrderIter(root_node))
+def return_new_parent(node, fact_tree_children_dict, label_and_id_index):
     # step 1: recursion
     try:
         parent_id = node.parent_id
@@ -367,18 +716,9 @@ def return_new_parent(node, fact_tree_children_dict):
         label = None
 
     if label:
-        for suffix, tree_node in fact_tree_children_dict.items():
-            if suffix in label:
-                try:
-                    parent_label = tree_node.attrib.get("{http://www.w3.org/1999/xlink}label")
-                except:
-                    parent_label = None
-                if parent_label:
-                    if label == parent_label:
-                        return tree_node
-                parent = recursive_label_node_getter(tree_node, label)
-                if parent:
-                    return parent
+        parent = label_and_id_index.label_node(label)
+        if parent:
+            return parent
     # step 5: from and to attributes
     try:
         from_attrib = node.attrib.get("{http://www.w3.org/1999/xlink}from")
@@ -408,18 +748,9 @@ def return_new_parent(node, fact_tree_children_dict):
                     break
         '''
         # from attribute (return node)
-        for suffix, tree_node in fact_tree_children_dict.items():
-            if suffix in from_attrib:
-                try:
-                    parent_label = tree_node.attrib.get("{http://www.w3.org/1999/xlink}label")
-                except:
-                    parent_label = None
-                if parent_label:
-                    if from_attrib == parent_label:
-                        return tree_node
-                parent = recursive_label_node_getter(tree_node, from_attrib)
-                if parent:
-                    return parent
+        parent = label_and_id_index.label_node(from_attrib)
+        if parent:
+            return parent
     # step 4 roles
     try:
         role = node.attrib.get("{http://www.w3.org/1999/xlink}role")
@@ -429,7 +760,7 @@ def return_new_parent(node, fact_tree_children_dict):
         parent = fact_tree_children_dict.get(role.split("/")[-1])
         if parent:
             return parent
-def return_new_parent_round_two(node, fact_tree_children_dict):
+def return_new_parent_round_two(node, fact_tree_children_dict, label_and_id_index):
     look_up_list = ["name", "{http://www.w3.org/1999/xlink}from", "id"]
     for item in look_up_list:
         try:
@@ -437,17 +768,15 @@ def return_new_parent_round_two(node, fact_tree_children_dict):
         except:
             attribute = None
         if attribute:
-            for suffix, tree_node in fact_tree_children_dict.items():
-                if suffix == attribute:
-                    return tree_node
-                elif suffix in attribute:
-                    parent = recursive_node_id_getter(tree_node, attribute)
-                    if parent:
-                        return parent
-                    parent = recursive_label_node_getter(tree_node, attribute)
-                    if parent:
-                        return parent
-def return_new_parent_for_Axis_contextRefs(node):
+            parent = label_and_id_index.id_or_label_node(attribute)
+            if parent:
+                return parent
+def return_new_parent_for_Axis_contextRefs(node, axis_subparent_dict):
+    ''' facts with Axis/Member contextRefs go under a subparent for each Axis/Member in the contextRef,
+        nested in contextRef order, e.g. Revenues -> StatementGeographicalAxis -> USMember -> fact
+        axis_subparent_dict (parent -> {suffix: subparent}) holds the subparents made so far in this stage,
+        they are only made here and never move, so it stays current without rescanning parent.children
+    '''
     try:
         contextRef = node.attrib.get('contextRef')
     except:
@@ -458,21 +787,164 @@ def return_new_parent_for_Axis_contextRefs(node):
     if len(split_contextRef) == 1:
         return
     if "Axis" in contextRef or "Member" in contextRef:
-        for index, sub_string in enumerate(split_contextRef):
-            if sub_string.endswith("Axis") or sub_string.endswith("Member"):
-                parent = node.parent
-
-                for child in parent.children:
-                    if child.suffix == sub_string:
-                        return child
-                # we should have establish there is no pre-existing subparent if we are here
+        axis_member_list = [sub_string for sub_string in split_contextRef if sub_string.endswith("Axis") or sub_string.endswith("Member")]
+        if not axis_member_list:
+            return
+        parent = node.parent
+        for sub_string in axis_member_list:
+            suffix_subparent_dict = axis_subparent_dict.setdefault(parent, {})
+            subparent = suffix_subparent_dict.get(sub_string)
+            if subparent is None:
                 subparent = anytree.Node(sub_string,
                                     parent              = parent,
                                     # node_order        = node_order,
                                     suffix              = sub_string,
                                     axis                = True
                                     )
-                return subparent
+                suffix_subparent_dict[sub_string] = subparent
+            parent = subparent
+        return parent
+class SuffixMatcher:
+    ''' Aho-Corasick automaton over the fact_tree_children_dict suffixes,
+        answers "which suffixes are in this string" in time proportional to the string length,
+        rather than testing every suffix. Results keep the dict order, so first match stays first match.
+    '''
+    def __init__(self, suffix_list):
+        self.rank_dict = {suffix: rank for rank, suffix in enumerate(suffix_list)}
+        # "" is in every string
+        self.empty_suffix_list = [suffix for suffix in self.rank_dict if suffix == ""]
+        self.goto_list = [{}]
+        self.fail_list = [0]
+        self.output_list = [[]]
+        for suffix in self.rank_dict:
+            state = 0
+            for character in suffix:
+                next_state = self.goto_list[state].get(character)
+                if next_state is None:
+                    next_state = len(self.goto_list)
+                    self.goto_list.append({})
+                    self.fail_list.append(0)
+                    self.output_list.append([])
+                    self.goto_list[state][character] = next_state
+                state = next_state
+            if suffix:
+                self.output_list[state].append(suffix)
+        ''' failure links, breadth first, so the shorter states are done first '''
+        queue = collections.deque(self.goto_list[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.goto_list[state].items():
+                queue.append(next_state)
+                fail_state = self.fail_list[state]
+                while fail_state and character not in self.goto_list[fail_state]:
+                    fail_state = self.fail_list[fail_state]
+                self.fail_list[next_state] = self.goto_list[fail_state].get(character, 0)
+                self.output_list[next_state] = self.output_list[next_state] + self.output_list[self.fail_list[next_state]]
+    def matching_suffix_set(self, string):
+        suffix_set = set(self.empty_suffix_list)
+        goto_list = self.goto_list
+        fail_list = self.fail_list
+        output_list = self.output_list
+        state = 0
+        for character in string:
+            while state and character not in goto_list[state]:
+                state = fail_list[state]
+            state = goto_list[state].get(character, 0)
+            if output_list[state]:
+                suffix_set.update(output_list[state])
+        return suffix_set
+    def matching_suffixes(self, string):
+        ''' the suffixes in string, in the original order '''
+        return sorted(self.matching_suffix_set(string), key=self.rank_dict.get)
+class LabelAndIdIndex:
+    ''' inverted index for the deep sorting passes, xlink:label (and its loc_ -> lab_ variant) or id -> nodes
+
+        nodes are indexed once, from both trees, since nodes move from the other tree into the fact tree
+        while sorting. A lookup keeps the matches currently under a fact_tree_children_dict node whose suffix
+        is in the string, and picks them like the suffix loop + recursive getters would: first suffix in
+        dict order, then pre-order within that subtree. That last part is only needed on a tie, so there
+        we fall back on the recursive getter for the one subtree.
+    '''
+    def __init__(self, fact_tree_root, other_tree_root, fact_tree_children_dict):
+        self.fact_tree_root = fact_tree_root
+        self.fact_tree_children_dict = fact_tree_children_dict
+        self.suffix_matcher = SuffixMatcher(fact_tree_children_dict)
+        self.rank_dict = {tree_node: rank for rank, tree_node in enumerate(fact_tree_children_dict.values())}
+        self.label_dict = {}
+        self.id_dict = {}
+        for root_node in [fact_tree_root, other_tree_root]:
+            for node in anytree.PreOrderIter(root_node):
+                attrib = getattr(node, "attrib", None)
+                if not isinstance(attrib, dict):
+                    continue
+                label = attrib.get("{http://www.w3.org/1999/xlink}label")
+                if label:
+                    self.label_dict.setdefault(label, []).append(node)
+                    lab_label = label.replace("loc_", "lab_")
+                    if lab_label != label:
+                        self.label_dict.setdefault(lab_label, []).append(node)
+                node_id = attrib.get("id")
+                if node_id:
+                    self.id_dict.setdefault(node_id, []).append(node)
+    def return_top_level_node(self, node):
+        ''' the fact_tree_root child that node currently sits under, None if it's not in the fact tree '''
+        while node is not None:
+            parent = node.parent
+            if parent is self.fact_tree_root:
+                return node
+            node = parent
+    def return_first_ranked_matches(self, string, index_dict):
+        ''' returns the rank, top level node and matches for the first ranked subtree with a match '''
+        best_rank = None
+        best_top_level_node = None
+        match_list = []
+        node_list = index_dict.get(string)
+        if not node_list:
+            return best_rank, best_top_level_node, match_list
+        suffix_set = self.suffix_matcher.matching_suffix_set(string)
+        for node in node_list:
+            top_level_node = self.return_top_level_node(node)
+            rank = self.rank_dict.get(top_level_node)
+            if rank is None:
+                continue
+            if top_level_node.suffix not in suffix_set:
+                continue
+            if best_rank is None or rank < best_rank:
+                best_rank = rank
+                best_top_level_node = top_level_node
+                match_list = [node]
+            elif rank == best_rank:
+                match_list.append(node)
+        return best_rank, best_top_level_node, match_list
+    def label_node(self, label):
+        ''' indexed version of the old suffix loop over recursive_label_node_getter, for steps 3 and 5 of return_new_parent '''
+        rank, top_level_node, match_list = self.return_first_ranked_matches(label, self.label_dict)
+        if not match_list:
+            return
+        if len(match_list) == 1:
+            return match_list[0]
+        return recursive_label_node_getter(top_level_node, label)
+    def id_or_label_node(self, attribute):
+        ''' indexed version of the old suffix loop over recursive_node_id_getter and recursive_label_node_getter in return_new_parent_round_two,
+            at the same rank an exact suffix match wins, then an id match, then a label match
+        '''
+        exact_node = self.fact_tree_children_dict.get(attribute)
+        exact_rank = self.rank_dict.get(exact_node)
+        id_rank, id_top_level_node, id_match_list = self.return_first_ranked_matches(attribute, self.id_dict)
+        label_rank, label_top_level_node, label_match_list = self.return_first_ranked_matches(attribute, self.label_dict)
+        rank_list = [rank for rank in [exact_rank, id_rank, label_rank] if rank is not None]
+        if not rank_list:
+            return
+        best_rank = min(rank_list)
+        if exact_rank == best_rank:
+            return exact_node
+        if id_rank == best_rank:
+            if len(id_match_list) == 1:
+                return id_match_list[0]
+            return recursive_node_id_getter(id_top_level_node, attribute)
+        if len(label_match_list) == 1:
+            return label_match_list[0]
+        return recursive_label_node_getter(label_top_level_node, attribute)
 def recursive_node_id_getter(node, original_id):
     try:
         potential_id_match = node.attrib.get("id")
@@ -535,25 +1007,27 @@ def other_tree_node_replacement(attribute_list, fact_tree_root_children):
                 if replacement_node:
                     return replacement_node
     return replacement_node
-def xbrl_to_json_processor(xbrl_filename, ticker, root_node=None, write_file=False, write_txt_file=False):
+def xbrl_to_json_processor(xbrl_filename, ticker, root_node=None, write_file=False, write_txt_file=False, compact_json=False):
     if not (xbrl_filename or root_node):
         logging.error("You must include a either a filename or root_node")
         sys.exit()
     if not root_node:
         root_node = process_xbrl_file_to_tree(xbrl_filename, ticker)
     #print(anytree.RenderTree(root_node))
-    flat_file_dict = convert_tree_to_dict(root_node)
     if write_file:
         should_be_json_filename = xbrl_filename
         if not should_be_json_filename.endswith(".json"):
             should_be_json_filename = should_be_json_filename + ".json"
-        write_dict_as_json(flat_file_dict, should_be_json_filename)
+        # written straight from the tree, no dict copy of it is needed
+        write_tree_as_json(root_node, should_be_json_filename, compact=compact_json)
         if write_txt_file:
             root_node_to_rendertree_text_file(root_node, should_be_json_filename)
     return root_node
-def custom_render_tree(root_node):
-    output_str = ""
-    for pre, _, node in anytree.RenderTree(root_node):
+def custom_render_tree(root_node, maxlevel=None):
+    return "".join(iter_custom_render_tree_strs(root_node, maxlevel=maxlevel))
+def iter_custom_render_tree_strs(root_node, maxlevel=None):
+    ''' the custom render, a node at a time '''
+    for pre, _, node in anytree.RenderTree(root_node, maxlevel=maxlevel):
         fact = ""
         formatted_fact = ""
         attrib = ""
@@ -568,95 +1042,397 @@ def custom_render_tree(root_node):
         if attrib:
             formatted_attrib = "\n{}{}".format(pre, attrib)
         formatted_str = "{}{}{}{}\n".format(pre, node.name, formatted_fact, formatted_attrib)
-        output_str = output_str + "\n" + formatted_str
-    return output_str
-def root_node_to_rendertree_text_file(root_node, xbrl_filename, custom=False):
-    with open('{}_render.txt'.format(xbrl_filename), 'w') as outfile:
-            if custom:
-                output_str = custom_render_tree(root_node)
+        yield "\n" + formatted_str
+def iter_render_tree_strs(root_node, maxlevel=None):
+    ''' str(anytree.RenderTree(root_node)), a line at a time '''
+    first_line = True
+    for row in anytree.RenderTree(root_node, maxlevel=maxlevel):
+        lines = repr(row.node).splitlines() or [""]
+        lines = ["{}{}".format(row.pre, lines[0])] + ["{}{}".format(row.fill, line) for line in lines[1:]]
+        for line in lines:
+            if first_line:
+                first_line = False
+                yield line
             else:
-                output_str = str(anytree.RenderTree(root_node))
-            outfile.write(output_str)
-def recursive_iter(xbrl_element, reversed_ns, ticker, parent=None, node_order=0):
-    elements = []
-    clark, prefix, suffix = xbrl_clark_prefix_and_suffix(xbrl_element, reversed_ns)
-
-    fact = xbrl_element.text
-    if isinstance(fact, str):
-        fact = fact.strip()
-    if fact is None:
-        fact = ""
-    attrib = xbrl_element.attrib
-    parent_id = None
-    if fact:
-        try:
-            parent_id = parent.attrib.get("id")
-            if parent_id is None:
-                if parent.suffix == "period":
-                    grandparent = parent.parent
-                    # use parent_id for simpler code
-                    parent_id = grandparent.attrib.get("id")
-        except:
-            pass
-
-    if parent_id and fact:
-        node_element = anytree.Node(suffix,
-                                    parent    = parent,
-                                    parent_id = parent_id,
-                                    #node_order= node_order,
-                                    clark     = clark,
-                                    prefix    = prefix,
-                                    suffix    = suffix,
-                                    fact      = fact,
-                                    attrib    = attrib,
-                                    )
+                yield "\n" + line
+def root_node_to_rendertree_text_file(root_node, xbrl_filename, custom=False, max_depth=None, max_chars=None):
+    ''' written as it's rendered. max_depth stops at that many levels below the root,
+        max_chars cuts the file off after roughly that many characters (RENDER_TXT_* are the defaults)
+    '''
+    if max_depth is None:
+        max_depth = RENDER_TXT_MAX_DEPTH
+    if max_chars is None:
+        max_chars = RENDER_TXT_MAX_CHARS
+    # RenderTree counts the root as level 1
+    maxlevel = max_depth + 1 if max_depth is not None else None
+    if custom:
+        render_strs = iter_custom_render_tree_strs(root_node, maxlevel=maxlevel)
     else:
-        node_element = anytree.Node(suffix,
-                                    parent    = parent,
-                                    #node_order= node_order,
-                                    clark     = clark,
-                                    prefix    = prefix,
-                                    suffix    = suffix,
-                                    fact      = fact,
-                                    attrib    = attrib,
-                                    )
-
-    elements.append(node_element)
-    subtag_count_dict = {}
-    for element in xbrl_element:
-        count = subtag_count_dict.get(element.tag)
-        if count is None:
-            subtag_count_dict[element.tag] = 1
-            count = 0
-        else:
-            subtag_count_dict[element.tag] = count + 1
-        sub_elements = recursive_iter(element,
-                                      reversed_ns,
-                                      ticker,
-                                      parent=node_element,
-                                      node_order=count,
-                                      )
-        for element_sub2 in sub_elements:
-            elements.append(element_sub2)
-    return elements
-def process_xbrl_file_to_tree(xbrl_filename, ticker):
+        render_strs = iter_render_tree_strs(root_node, maxlevel=maxlevel)
+    chars_written = 0
+    with open('{}_render.txt'.format(xbrl_filename), 'w') as outfile:
+        for render_str in render_strs:
+            if max_chars is not None and chars_written + len(render_str) > max_chars:
+                outfile.write("\n... render cut off at {} characters".format(max_chars))
+                break
+            outfile.write(render_str)
+            chars_written += len(render_str)
+class XbrlNode(anytree.NodeMixin):
+    ''' compact node for parsed xbrl elements
+        the attributes live in __slots__ rather than a per node __dict__, with explicit defaults,
+        so there is no need for try/except probing. NodeMixin has no slots, so a __dict__ is still
+        available, but it's only created if something unexpected gets set on the node.
+    '''
+    __slots__ = ("name", "clark", "prefix", "suffix", "fact", "attrib", "parent_id", "axis",
+                 "_NodeMixin__parent", "_NodeMixin__children")
+    def __init__(self, name, parent=None, clark=None, prefix=None, suffix=None, fact="", attrib=None, parent_id=None, axis=False):
+        self.name = name
+        self.clark = clark
+        self.prefix = prefix
+        self.suffix = suffix
+        self.fact = fact
+        if attrib is None:
+            attrib = {}
+        self.attrib = attrib
+        self.parent_id = parent_id
+        self.axis = axis
+        self.parent = parent
+    def xbrl_items(self):
+        ''' the key, value pairs an anytree.Node would have in its __dict__ '''
+        items = [("name", self.name),
+                 ("clark", self.clark),
+                 ("prefix", self.prefix),
+                 ("suffix", self.suffix),
+                 ("fact", self.fact),
+                 ("attrib", self.attrib),
+                 ]
+        if self.parent_id is not None:
+            items.append(("parent_id", self.parent_id))
+        if self.axis:
+            items.append(("axis", self.axis))
+        items.extend(vars(self).items())
+        return items
+    def __repr__(self):
+        args = ["{!r}".format(self.separator.join([""] + [str(node.name) for node in self.path]))]
+        for key, value in sorted(self.xbrl_items(), key=lambda item: item[0]):
+            if key == "name" or key.startswith("_"):
+                continue
+            args.append("{}={!r}".format(key, value))
+        # as anytree.Node, so the _render.txt files don't change
+        return "Node({})".format(", ".join(args))
+class XbrlNodeDictExporter(anytree.exporter.DictExporter):
+    ''' the stock DictExporter only reads __dict__, which would miss the XbrlNode slots '''
+    @staticmethod
+    def _iter_attr_values(node):
+        if isinstance(node, XbrlNode):
+            return iter(node.xbrl_items())
+        return anytree.exporter.DictExporter._iter_attr_values(node)
+def return_node_fingerprint(node):
+    ''' hashable version of a node's own values (vars() without the tree links),
+        nodes with the same fingerprint are duplicates
+    '''
+    attrib = getattr(node, "attrib", None)
+    if isinstance(attrib, dict):
+        attrib = tuple(sorted(attrib.items()))
+    return (node.name,
+            getattr(node, "clark", None),
+            getattr(node, "prefix", None),
+            getattr(node, "suffix", None),
+            getattr(node, "fact", None),
+            attrib,
+            getattr(node, "parent_id", None),
+            )
+def iterative_xbrl_tree_builder(xbrl_root_element, reversed_ns, ticker):
+    ''' builds the node tree with an explicit stack, so each node is made exactly once,
+        and deep linkbases can't hit the recursion limit. Only the root is returned.
+    '''
+    xbrl_tree_root = None
+    # children are pushed in reverse, so they are popped (and attached) in document order
+    stack = [(xbrl_root_element, None)]
+    while stack:
+        xbrl_element, parent = stack.pop()
+        clark, prefix, suffix = xbrl_clark_prefix_and_suffix(xbrl_element, reversed_ns)
+
+        fact = xbrl_element.text
+        if isinstance(fact, str):
+            fact = fact.strip()
+        if fact is None:
+            fact = ""
+        attrib = xbrl_element.attrib
+        parent_id = None
+        if fact:
+            parent_id = return_parent_id(parent)
+
+        node_element = XbrlNode(suffix,
+                                parent    = parent,
+                                parent_id = parent_id,
+                                clark     = clark,
+                                prefix    = prefix,
+                                suffix    = suffix,
+                                fact      = fact,
+                                attrib    = attrib,
+                                )
+        if xbrl_tree_root is None:
+            xbrl_tree_root = node_element
+        for element in reversed(xbrl_element):
+            stack.append((element, node_element))
+    return xbrl_tree_root
+def stream_xbrl_file_to_tree(xbrl_filename, ticker):
+    ''' single pass version of extract_xbrl_tree_namespace_and_root + iterative_xbrl_tree_builder
+        namespaces are collected as they are declared, nodes are made on "start" (when the attrib is known),
+        and finished on "end" (when the text is known), then the element is dropped so the
+        full ElementTree is never held in memory
+    '''
+    ns = {}
+    reversed_ns = {}
+    element_stack = []
+    node_stack = []
+    xbrl_tree_root = None
+    try:
+        for event, item in ET.iterparse(xbrl_filename, ['start-ns', 'start', 'end']):
+            if event == 'start-ns':
+                name, value = item
+                if name:
+                    ns[name] = value
+                    reversed_ns = {value: key for key, value in ns.items()}
+            elif event == 'start':
+                clark, prefix, suffix = xbrl_clark_prefix_and_suffix(item, reversed_ns)
+                parent = None
+                if node_stack:
+                    parent = node_stack[-1]
+                node_element = XbrlNode(suffix,
+                                        parent    = parent,
+                                        clark     = clark,
+                                        prefix    = prefix,
+                                        suffix    = suffix,
+                                        # copy, clearing the element would clear its attrib too
+                                        attrib    = dict(item.attrib),
+                                        )
+                if xbrl_tree_root is None:
+                    xbrl_tree_root = node_element
+                element_stack.append(item)
+                node_stack.append(node_element)
+            elif event == 'end':
+                node_element = node_stack.pop()
+                element_stack.pop()
+                fact = item.text
+                if isinstance(fact, str):
+                    fact = fact.strip()
+                if fact:
+                    node_element.fact = fact
+                    parent_id = return_parent_id(node_element.parent)
+                    if parent_id:
+                        node_element.parent_id = parent_id
+                # all the children have been dealt with already, so the element can go
+                item.clear()
+                if element_stack:
+                    element_stack[-1].remove(item)
+    except Exception as e:
+        logging.error(e)
+        return None
+    return xbrl_tree_root
+def return_parent_id(parent):
+    ''' the id of the context a fact belongs to, period facts look to the grandparent '''
+    parent_id = None
+    try:
+        parent_id = parent.attrib.get("id")
+        if parent_id is None:
+            if parent.suffix == "period":
+                grandparent = parent.parent
+                # use parent_id for simpler code
+                parent_id = grandparent.attrib.get("id")
+    except:
+        pass
+    return parent_id
+def process_xbrl_file_to_tree(xbrl_filename, ticker, streaming=True):
     logging.info(xbrl_filename)
+    if streaming:
+        return stream_xbrl_file_to_tree(xbrl_filename, ticker)
     tree, ns, root = extract_xbrl_tree_namespace_and_root(xbrl_filename)
     #print(root)
     reversed_ns = {value: key for key, value in ns.items()}
-    elements = recursive_iter(root, reversed_ns, ticker)
-    #print(len(elements))
-    xbrl_tree_root = elements[0]
+    xbrl_tree_root = iterative_xbrl_tree_builder(root, reversed_ns, ticker)
     return xbrl_tree_root
+def return_sorted_json_value(value):
+    ''' a copy of value with the key order and containers json.loads(json.dumps(value, sort_keys=True)) gives '''
+    if isinstance(value, dict):
+        return {str(key): return_sorted_json_value(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [return_sorted_json_value(item) for item in value]
+    return value
+def return_sorted_node_items(node):
+    ''' a node's own exported values, in the sorted order the cached json uses '''
+    return sorted(XbrlNodeDictExporter._iter_attr_values(node), key=lambda item: item[0])
 def convert_tree_to_dict(root_node):
-    exporter = anytree.exporter.JsonExporter(indent=2, sort_keys=True)
-    json_dict = json.loads(exporter.export(root_node))
-    return json_dict
+    ''' same dict as exporting to a sorted json string and loading it back,
+        built in one walk of the tree without the string in between
+    '''
+    root_dict = None
+    node_stack = [(root_node, None)]
+    while node_stack:
+        node, parent_children_list = node_stack.pop()
+        node_dict = {}
+        for key, value in return_sorted_node_items(node):
+            node_dict[key] = return_sorted_json_value(value)
+        if node.children:
+            children_list = []
+            node_dict["children"] = children_list
+            # re-sort, "children" falls in between the other keys
+            node_dict = {key: node_dict[key] for key in sorted(node_dict)}
+            for child in reversed(node.children):
+                node_stack.append((child, children_list))
+        if parent_children_list is None:
+            root_dict = node_dict
+        else:
+            parent_children_list.append(node_dict)
+    return root_dict
+def iter_tree_json_chunks(root_node, compact=False):
+    ''' yields the json text of convert_tree_to_dict(root_node) as bytes, a node at a time,
+        so the whole tree never has to exist as a dict
+    '''
+    newline = b"" if compact else b"\n"
+    key_separator = b":" if compact else b": "
+    # the stack holds either bytes to write, or a (node, level) to open up
+    chunk_stack = [(root_node, 0)]
+    while chunk_stack:
+        item = chunk_stack.pop()
+        if isinstance(item, bytes):
+            yield item
+            continue
+        node, level = item
+        node_indent = return_json_indent(level, compact)
+        key_indent = return_json_indent(level + 1, compact)
+        child_indent = return_json_indent(level + 2, compact)
+        node_items = [(key, value) for key, value in return_sorted_node_items(node) if key != "children"]
+        children = node.children
+        if children:
+            node_items.append(("children", children))
+            node_items.sort(key=lambda item: item[0])
+        to_write = [b"{" + newline]
+        for index, (key, value) in enumerate(node_items):
+            separator = b"," + newline if index < len(node_items) - 1 else newline
+            key_bytes = key_indent + return_json_bytes(key) + key_separator
+            if key == "children" and children:
+                to_write.append(key_bytes + b"[" + newline)
+                for child_index, child in enumerate(children):
+                    to_write.append(child_indent)
+                    to_write.append((child, level + 2))
+                    to_write.append(b"," + newline if child_index < len(children) - 1 else newline)
+                to_write.append(key_indent + b"]" + separator)
+            else:
+                value_bytes = return_json_bytes(value, compact=compact, sort_keys=True, level=level + 1)
+                to_write.append(key_bytes + value_bytes + separator)
+        to_write.append(node_indent + b"}")
+        chunk_stack.extend(reversed(to_write))
+def write_tree_as_json(root_node, json_filename, compact=False):
+    logging.info("writing: {}".format(json_filename))
+    with open(json_filename, 'wb') as outfile:
+        for chunk in iter_tree_json_chunks(root_node, compact=compact):
+            outfile.write(chunk)
 def convert_dict_to_node_tree(dict_to_convert):
     importer = anytree.importer.JsonImporter()
     json_str = json.dumps(dict_to_convert)
     root_node = importer.import_(json_str)
     return root_node
+def return_tree_cache_filename(json_filename):
+    ''' the binary tree cache sits next to the json: <ticker>-<date>.json -> <ticker>-<date>.tree '''
+    if json_filename.endswith(".json"):
+        json_filename = json_filename[:-len(".json")]
+    return json_filename + ".tree"
+def return_interned_value(value, interned_dict):
+    ''' equal strings become the same object, so marshal only stores each one once.
+        dict keys are sorted, as they are in the json
+    '''
+    if isinstance(value, str):
+        return interned_dict.setdefault(value, value)
+    if isinstance(value, dict):
+        return {return_interned_value(str(key), interned_dict): return_interned_value(value[key], interned_dict) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [return_interned_value(item, interned_dict) for item in value]
+    return value
+def return_tree_cache_key():
+    ''' what a cache has to match to be loaded: our layout version and the marshal format,
+        which can change between python versions
+    '''
+    return "{}|python {}.{}|marshal {}".format(TREE_CACHE_VERSION, sys.version_info[0], sys.version_info[1], marshal.version).encode()
+def write_tree_cache(root_node, cache_filename):
+    ''' binary version of the <ticker>-<date>.json tree, same nodes and values, much faster to load.
+
+        nodes are stored flat in pre-order: an array of parent indexes (-1 for the root),
+        an array of indexes into a table of key tuples (most nodes share the same keys),
+        and a list of value tuples, with all the strings interned.
+        it's marshal, not pickle, so only plain data goes in and loading one never runs any code.
+    '''
+    logging.info("writing: {}".format(cache_filename))
+    interned_dict = {}
+    key_tuple_dict = {}
+    parent_index_array = array.array("i")
+    key_tuple_index_array = array.array("I")
+    value_tuple_list = []
+    node_index_dict = {}
+    for node_index, node in enumerate(anytree.PreOrderIter(root_node)):
+        node_index_dict[id(node)] = node_index
+        parent = node.parent
+        parent_index_array.append(-1 if parent is None or node is root_node else node_index_dict[id(parent)])
+        node_items = return_sorted_node_items(node)
+        key_tuple = tuple(return_interned_value(key, interned_dict) for key, value in node_items)
+        key_tuple_index_array.append(key_tuple_dict.setdefault(key_tuple, len(key_tuple_dict)))
+        value_tuple_list.append(tuple(return_interned_value(value, interned_dict) for key, value in node_items))
+    tree_cache = (list(key_tuple_dict), parent_index_array.tobytes(), key_tuple_index_array.tobytes(), value_tuple_list)
+    try:
+        tree_cache_bytes = marshal.dumps(tree_cache)
+    except ValueError as e:
+        # a value marshal can't store, the json is still there
+        logging.error("not writing {}: {}".format(cache_filename, e))
+        return
+    cache_key = return_tree_cache_key()
+    with open(cache_filename, 'wb') as outfile:
+        outfile.write(TREE_CACHE_MAGIC)
+        outfile.write(len(cache_key).to_bytes(2, "big"))
+        outfile.write(cache_key)
+        outfile.write(tree_cache_bytes)
+def import_tree_cache(cache_filename, json_filename=None):
+    ''' the tree written by write_tree_cache, built like convert_dict_to_node_tree would (AnyNodes),
+        or None if there is no usable cache (missing, another cache key, or older than the json).
+        the json is what gets deleted to force a rebuild, so without it the cache isn't used either.
+        marshal runs no code, but it isn't hardened against crafted files either,
+        so only caches this program wrote to its own XBRL_Data folder should be loaded.
+    '''
+    if not os.path.isfile(cache_filename):
+        return None
+    if json_filename:
+        if not os.path.isfile(json_filename):
+            return None
+        if os.path.getmtime(cache_filename) < os.path.getmtime(json_filename):
+            logging.info("tree cache is older than the json, ignoring: {}".format(cache_filename))
+            return None
+    logging.info("importing: {}".format(cache_filename))
+    try:
+        with open(cache_filename, 'rb') as inputfile:
+            if inputfile.read(len(TREE_CACHE_MAGIC)) != TREE_CACHE_MAGIC:
+                return None
+            cache_key = return_tree_cache_key()
+            key_length = int.from_bytes(inputfile.read(2), "big")
+            if key_length != len(cache_key) or inputfile.read(key_length) != cache_key:
+                logging.info("tree cache version has changed, ignoring: {}".format(cache_filename))
+                return None
+            key_tuple_list, parent_index_bytes, key_tuple_index_bytes, value_tuple_list = marshal.loads(inputfile.read())
+        parent_index_array = array.array("i")
+        parent_index_array.frombytes(parent_index_bytes)
+        key_tuple_index_array = array.array("I")
+        key_tuple_index_array.frombytes(key_tuple_index_bytes)
+    except Exception as e:
+        logging.error(e)
+        return None
+    node_list = []
+    for parent_index, key_tuple_index, value_tuple in zip(parent_index_array, key_tuple_index_array, value_tuple_list):
+        parent = node_list[parent_index] if parent_index >= 0 else None
+        # the same as anytree's DictImporter does
+        node = anytree.AnyNode(parent=parent, **dict(zip(key_tuple_list[key_tuple_index], value_tuple)))
+        node_list.append(node)
+    if not node_list:
+        return None
+    return node_list[0]
 #### utils ####
 def extract_xbrl_tree_namespace_and_root(xbrl_filename):
     ns = {}
@@ -692,13 +1468,142 @@ def return_xlink_locator(element_with_href):
     return href
 def import_json(json_filename):
     logging.info("importing: {}".format(json_filename))
-    with open(json_filename, 'r') as inputfile:
-        data_dict = json.load(inputfile)
+    with open(json_filename, 'rb') as inputfile:
+        data_dict = return_loaded_json(inputfile.read())
     return data_dict
-def write_dict_as_json(dict_to_write, json_filename):
+def return_loaded_json(json_bytes):
+    if orjson is not None:
+        return orjson.loads(json_bytes)
+    return json.loads(json_bytes)
+def return_json_indent(level, compact=False, indent=2):
+    if compact:
+        return b""
+    return b" " * (indent * level)
+def return_json_bytes(value, compact=False, sort_keys=False, level=0):
+    ''' value as json bytes, indented by 2 (unless compact) as if it were nested level deep.
+        orjson is used if it's installed and can take the value, the stdlib json otherwise
+    '''
+    json_bytes = None
+    if orjson is not None:
+        option = 0 if compact else orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            json_bytes = orjson.dumps(value, option=option)
+        except TypeError:
+            # orjson is stricter (non-str keys, huge ints), let json deal with it
+            json_bytes = None
+    if json_bytes is None:
+        if compact:
+            json_bytes = json.dumps(value, separators=(",", ":"), sort_keys=sort_keys).encode()
+        else:
+            json_bytes = json.dumps(value, indent=2, sort_keys=sort_keys).encode()
+    if level and not compact:
+        json_bytes = json_bytes.replace(b"\n", b"\n" + return_json_indent(level))
+    return json_bytes
+def iter_dict_json_chunks(dict_to_write, compact=False, stream_depth=2, level=0, key_path=()):
+    ''' yields (key_path, json bytes) pieces of dict_to_write. dicts are opened up an item at a time
+        down to stream_depth levels, so a facts dict ({ticker: {concept: ...}}) goes out a concept at a time,
+        the values below that are encoded whole and come with their key path,
+        the braces, keys and separators in between come with None.
+    '''
+    if not isinstance(dict_to_write, dict) or not dict_to_write or level >= stream_depth:
+        yield (key_path if level else None), return_json_bytes(dict_to_write, compact=compact, level=level)
+        return
+    newline = b"" if compact else b"\n"
+    key_separator = b":" if compact else b": "
+    key_indent = return_json_indent(level + 1, compact)
+    yield None, b"{" + newline
+    for index, (key, value) in enumerate(dict_to_write.items()):
+        item_separator = b"," + newline if index else b""
+        yield None, item_separator + key_indent + return_json_bytes(str(key)) + key_separator
+        yield from iter_dict_json_chunks(value, compact=compact, stream_depth=stream_depth, level=level + 1, key_path=key_path + (str(key),))
+    yield None, newline + return_json_indent(level, compact) + b"}"
+def write_dict_as_json(dict_to_write, json_filename, compact=False, index_filename=None):
+    ''' streamed to disk, compact leaves out the indentation whitespace.
+        with an index_filename, the byte range of every value two levels down (the concepts
+        of a facts dict) is saved there as well, see LazyJsonMapping
+    '''
     logging.info("writing: {}".format(json_filename))
-    with open(json_filename, 'w') as outfile:
-        json.dump(dict_to_write, outfile, indent=2)
+    offset_dict = {}
+    position = 0
+    with open(json_filename, 'wb') as outfile:
+        for key_path, chunk in iter_dict_json_chunks(dict_to_write, compact=compact):
+            if key_path is not None and index_filename:
+                parent_offset_dict = offset_dict
+                for key in key_path[:-1]:
+                    parent_offset_dict = parent_offset_dict.setdefault(key, {})
+                parent_offset_dict[key_path[-1]] = [position, position + len(chunk)]
+            outfile.write(chunk)
+            position += len(chunk)
+    if index_filename:
+        index_dict = {"version": FACTS_DICT_INDEX_VERSION, "size": position, "offsets": offset_dict}
+        with open(index_filename, 'wb') as outfile:
+            outfile.write(return_json_bytes(index_dict, compact=True))
+def return_facts_dict_index_filename(json_filename):
+    ''' <ticker>-<date>_facts_dict.json -> <ticker>-<date>_facts_dict.idx '''
+    if json_filename.endswith(".json"):
+        json_filename = json_filename[:-len(".json")]
+    return json_filename + ".idx"
+class LazyJsonMapping(collections.abc.Mapping):
+    ''' read only dict-like view of a json file written by write_dict_as_json with an index_filename.
+
+        the file is memory mapped, and a value is only decoded the first time it's looked up,
+        so getting a few concepts out of a facts dict doesn't load the rest of it.
+        nested dicts that were indexed are LazyJsonMappings themselves.
+    '''
+    def __init__(self, json_mmap, offset_dict):
+        self.json_mmap = json_mmap
+        self.offset_dict = offset_dict
+        self.value_dict = {}
+    def __getitem__(self, key):
+        if key in self.value_dict:
+            return self.value_dict[key]
+        offsets = self.offset_dict[key]
+        if isinstance(offsets, dict):
+            value = LazyJsonMapping(self.json_mmap, offsets)
+        else:
+            start, end = offsets
+            value = return_loaded_json(self.json_mmap[start:end])
+        self.value_dict[key] = value
+        return value
+    def __iter__(self):
+        return iter(self.offset_dict)
+    def __len__(self):
+        return len(self.offset_dict)
+    def __repr__(self):
+        return "{}({} keys)".format(self.__class__.__name__, len(self.offset_dict))
+    def close(self):
+        self.json_mmap.close()
+def return_lazy_json_mapping(json_filename, index_filename=None):
+    ''' a LazyJsonMapping of json_filename, or None if its index is missing or out of date '''
+    if index_filename is None:
+        index_filename = return_facts_dict_index_filename(json_filename)
+    if not (os.path.isfile(json_filename) and os.path.isfile(index_filename)):
+        return None
+    if os.path.getmtime(index_filename) < os.path.getmtime(json_filename):
+        return None
+    try:
+        with open(index_filename, 'rb') as inputfile:
+            index_dict = return_loaded_json(inputfile.read())
+        if index_dict.get("version") != FACTS_DICT_INDEX_VERSION:
+            return None
+        if index_dict.get("size") != os.path.getsize(json_filename) or not index_dict.get("offsets"):
+            return None
+        with open(json_filename, 'rb') as inputfile:
+            json_mmap = mmap.mmap(inputfile.fileno(), 0, access=mmap.ACCESS_READ)
+    except Exception as e:
+        logging.error(e)
+        return None
+    return LazyJsonMapping(json_mmap, index_dict["offsets"])
+def import_facts_dict(json_filename, lazy=False):
+    ''' the facts dict, lazy returns a LazyJsonMapping when the index is usable, the full dict otherwise '''
+    if lazy:
+        lazy_mapping = return_lazy_json_mapping(json_filename)
+        if lazy_mapping is not None:
+            logging.info("lazy importing: {}".format(json_filename))
+            return lazy_mapping
+    return import_json(json_filename)
 def form_type_conversion(form_type, country_code, us_codes=US_COUNTRY_CODES, ca_codes=CANADA_COUNTRY_CODES):
     logging.info(country_code)
     if form_type == "10-Q":
@@ -964,7 +1869,18 @@ def full_sec_xbrl_folder_download(ticker, cik, form_type, date="most recent", pr
     logging.info("xbrl files created")
     return folder_name, data_date, sic, country_code, form_type
 #### main ####
-def main_download_and_convert(ticker, cik, form_type, year=None, month=None, day=None, force_download=False, delete_files_after_import=False):
+def main_download_and_convert(ticker, cik, form_type, year=None, month=None, day=None, force_download=False, delete_files_after_import=False, parallel_workers=None, keep_trash=True, profiler=None, compact_json=False, fact_columns_format=None, sqlite_filename=None, facts_only=False):
+    ''' the root node of the filing, from local files when they're recent enough, downloaded otherwise.
+        with facts_only, a filing whose folder went with delete_files_after_import is still local (its facts dict is),
+        but there is no tree left to return, so that returns None
+    '''
+    try:
+        return download_and_convert(ticker, cik, form_type, year=year, month=month, day=day, force_download=force_download, delete_files_after_import=delete_files_after_import, parallel_workers=parallel_workers, keep_trash=keep_trash, profiler=profiler, compact_json=compact_json, fact_columns_format=fact_columns_format, sqlite_filename=sqlite_filename, facts_only=facts_only)
+    finally:
+        # the report is only written on success, but tracemalloc is stopped either way
+        if profiler is not None:
+            profiler.finish()
+def download_and_convert(ticker, cik, form_type, year=None, month=None, day=None, force_download=False, delete_files_after_import=False, parallel_workers=None, keep_trash=True, profiler=None, compact_json=False, fact_columns_format=None, sqlite_filename=None, facts_only=False):
     given_date = None
     if year and (month and day):
         try:
@@ -989,10 +1905,18 @@ def main_download_and_convert(ticker, cik, form_type, year=None, month=None, day
             try:
                 folder_name = "{}-{}".format(ticker.lower(), given_date)
                 full_path = os.path.join(folder_path, folder_name)
-                if os.path.exists(full_path):
-                    xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, given_date, full_path, delete_files_after_import=delete_files_after_import)
-                    if not os.path.exists("{}_facts_dict.json".format(full_path)):
-                        convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, full_path)
+                facts_dict_exists = os.path.exists("{}_facts_dict.json".format(full_path))
+                if os.path.exists(full_path) or (facts_only and facts_dict_exists):
+                    if facts_only and facts_dict_exists and not os.path.isdir(full_path):
+                        # the files went with delete_files_after_import, the facts dict is all there is
+                        xbrl_tree_root = None
+                    else:
+                        xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, given_date, full_path, delete_files_after_import=delete_files_after_import, parallel_workers=parallel_workers, keep_trash=keep_trash, profiler=profiler, compact_json=compact_json, facts_only=facts_only)
+                    if not facts_dict_exists:
+                        convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, full_path, profiler=profiler, compact_json=compact_json, fact_columns_format=fact_columns_format, sqlite_filename=sqlite_filename, cik=cik, form_type=form_type, filing_date=given_date)
+                    elif sqlite_filename and xbrl_tree_root is not None:
+                        store_existing_filing_in_sqlite(xbrl_tree_root, ticker, full_path, sqlite_filename, cik=cik, form_type=form_type, filing_date=given_date, profiler=profiler)
+                    finish_profile(profiler, full_path)
                     return xbrl_tree_root
             except Exception as e:
                 logging.warning(e)
@@ -1002,21 +1926,24 @@ def main_download_and_convert(ticker, cik, form_type, year=None, month=None, day
         # then we will check the last month
         # if there are no files from the last month, we will attempt to download from the SEC
         else:
-            pattern = re.compile(ticker.lower() + r"-[0-9]{8}")
+            # only <ticker>-<yyyymmdd>.json exactly, not the facts dicts, caches or anything else that's in there.
+            # facts_only writes no tree json, so there the facts dict counts too
+            if facts_only:
+                pattern = re.compile(re.escape(ticker.lower()) + r"-([0-9]{8})(?:_facts_dict)?\.json")
+            else:
+                pattern = re.compile(re.escape(ticker.lower()) + r"-([0-9]{8})\.json")
             most_recent_folder_date = 0
             folder_ymd_tuple = None
             for filename in os.listdir(folder_path):
                 #logging.info(filename)
-                #logging.info(pattern.search(filename))
-                if filename.endswith(".json") and "facts_dict" not in filename:
-                    if ticker.lower() in filename:
-                        if pattern.search(filename):
-                            ticker_hyphen_date = filename.replace(".json", "")
-                            folder_date = ticker_hyphen_date.split("-")[1]
-                            #logging.info("{} {}".format(folder_date, most_recent_folder_date))
-                            if int(folder_date) > most_recent_folder_date:
-                                most_recent_folder_date = int(folder_date)
-                                folder_ymd_tuple = (ticker_hyphen_date, str(most_recent_folder_date)[:4], str(most_recent_folder_date)[4:6], str(most_recent_folder_date)[6:])
+                match = pattern.fullmatch(filename)
+                if match:
+                    folder_date = match.group(1)
+                    ticker_hyphen_date = "{}-{}".format(ticker.lower(), folder_date)
+                    #logging.info("{} {}".format(folder_date, most_recent_folder_date))
+                    if int(folder_date) > most_recent_folder_date:
+                        most_recent_folder_date = int(folder_date)
+                        folder_ymd_tuple = (ticker_hyphen_date, str(most_recent_folder_date)[:4], str(most_recent_folder_date)[4:6], str(most_recent_folder_date)[6:])
             if folder_ymd_tuple:
                 #logging.info("one line below")
                 #logging.info(pp.pformat(folder_ymd_tuple))
@@ -1030,21 +1957,36 @@ def main_download_and_convert(ticker, cik, form_type, year=None, month=None, day
                     period_seconds = MONTH_IN_SECONDS * 3
                 if now < (most_recent_folder_time + period_seconds): # if the folder is less than expected period for the next form
                     full_path = os.path.join(folder_path, folder_ymd_tuple[0])
-                    xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, most_recent_folder_date, full_path, delete_files_after_import=delete_files_after_import)
-                    if not os.path.exists("{}_facts_dict.json".format(full_path)):
-                        convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, full_path)
+                    facts_dict_exists = os.path.exists("{}_facts_dict.json".format(full_path))
+                    if facts_only and facts_dict_exists and not os.path.isdir(full_path):
+                        # the files went with delete_files_after_import, the facts dict is all there is
+                        xbrl_tree_root = None
+                    else:
+                        xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, most_recent_folder_date, full_path, delete_files_after_import=delete_files_after_import, parallel_workers=parallel_workers, keep_trash=keep_trash, profiler=profiler, compact_json=compact_json, facts_only=facts_only)
+                    if not facts_dict_exists:
+                        convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, full_path, profiler=profiler, compact_json=compact_json, fact_columns_format=fact_columns_format, sqlite_filename=sqlite_filename, cik=cik, form_type=form_type, filing_date=most_recent_folder_date)
+                    elif sqlite_filename and xbrl_tree_root is not None:
+                        store_existing_filing_in_sqlite(xbrl_tree_root, ticker, full_path, sqlite_filename, cik=cik, form_type=form_type, filing_date=most_recent_folder_date, profiler=profiler)
 
                     #logging.warning("remove this redundancy")
                     #convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, full_path)
 
+                    finish_profile(profiler, full_path)
                     return xbrl_tree_root
     folder_name, data_date, sic, country_code, form_type = full_sec_xbrl_folder_download(ticker, cik, form_type, date=given_date)
-    xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, data_date, folder_name, sic, country_code, delete_files_after_import=delete_files_after_import)
+    xbrl_tree_root = main_xbrl_to_json_converter(ticker, cik, data_date, folder_name, sic, country_code, delete_files_after_import=delete_files_after_import, parallel_workers=parallel_workers, keep_trash=keep_trash, profiler=profiler, compact_json=compact_json, facts_only=facts_only)
     logging.info(folder_name)
-    convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, folder_name)
+    convert_root_node_facts_to_fact_dict(xbrl_tree_root, ticker, folder_name, profiler=profiler, compact_json=compact_json, fact_columns_format=fact_columns_format, sqlite_filename=sqlite_filename, cik=cik, form_type=form_type, filing_date=data_date)
+    finish_profile(profiler, folder_name)
     return xbrl_tree_root
 #### extract fact_dict data from tree ####
-def convert_root_node_facts_to_fact_dict(root_node, ticker, folder_name):
+def convert_root_node_facts_to_fact_dict(root_node, ticker, folder_name, profiler=None, compact_json=False, fact_columns_format=None, sqlite_filename=None, cik=None, form_type=None, filing_date=None):
+    ''' writes <folder>_facts_dict.json, and with a fact_columns_format ("csv", "npz" or "parquet")
+        the columnar <folder>_facts.<format> export as well.
+        with a sqlite_filename the filing is also stored in that database, see write_filing_to_sqlite,
+        under filing_date (yyyymmdd), or the date in the <ticker>-<date> folder name when it isn't given
+    '''
+    stage_dict = start_profile_stage(profiler, "fact_dict")
     local_prefixes_that_matter = PREFIXES_THAT_MATTER + [ticker.lower()]
     dict_to_return = {}
     item_depth = 1
@@ -1090,15 +2032,12 @@ def convert_root_node_facts_to_fact_dict(root_node, ticker, folder_name):
                 else:
                     node_dict[label_ref][label_role_short] = fact
             else: #not label
-                dict_list = node_dict.get('list')
-                if dict_list is None:
-                    node_dict['list'] = [fact]
+                # a set while walking, turned into a sorted list once at the end
+                fact_set = node_dict.get('list')
+                if fact_set is None:
+                    node_dict['list'] = {fact}
                 else:
-                    if fact not in dict_list:
-                        #print(dict_list)
-                        #print(fact)
-                        dict_list.append(fact)
-                        dict_list.sort()
+                    fact_set.add(fact)
             #logging.info("failed at context_ref is None")
             #logging.info(fact)
             continue
@@ -1174,11 +2113,12 @@ def convert_root_node_facts_to_fact_dict(root_node, ticker, folder_name):
         if previous_entry is not None:
             if previous_entry != fact:
                 #logging.info("date: {}\nprevious entry: {}\ncurrent fact: {}\nfailed at previous_entry != node.fact\nPrevious Entry for: {}|{}|{}|{}".format(date, previous_entry, fact, node.suffix, date, node.fact, previous_entry))
-                node_decimals = node.attrib.get("decimals")
+                # as numbers, "-3" is more precise than "-6", and "INF" beats both
+                node_decimals = return_decimals_int(node.attrib.get("decimals"))
                 existing_attrib = entry_dict.get("{}_attrib".format(date))
-                existing_decimals = existing_attrib.get("decimals")
+                existing_decimals = return_decimals_int(existing_attrib.get("decimals"))
                 #logging.info("Check precision: {}|{}".format(node_decimals, existing_decimals))
-                if existing_decimals and node_decimals:
+                if existing_decimals is not None and node_decimals is not None:
                     if existing_decimals > node_decimals:
                         #logging.info("Ignoring less precise data.")
                         continue
@@ -1220,24 +2160,362 @@ def convert_root_node_facts_to_fact_dict(root_node, ticker, folder_name):
             entry_dict[date] = fact
             entry_dict["{}_attrib".format(date)] = node.attrib
 
+    for node_dict in dict_to_return.values():
+        fact_set = node_dict.get('list')
+        if isinstance(fact_set, set):
+            node_dict['list'] = sorted(fact_set)
+
     # sort labels
     label_dict = dict_to_return.get("label")
     # here i'm going to look at the labels dict,
     # then i'm going to look through the suffixes
     # if the suffix matches the label id str, add the labels to that dict
+    # (the first suffix, in dict order, with "_Taxes_" in "lab_us-gaap_Taxes_IDCHARSBLAHBLAH")
+    suffix_rank_dict = {suffix_str: rank for rank, suffix_str in enumerate(dict_to_return)}
+    suffix_dict_list = list(dict_to_return.values())
     for id_str, labels_to_move in label_dict.items():
-        for suffix_str, suffix_dict in dict_to_return.items():
-            if "_{}_".format(suffix_str) in id_str: # like "_Taxes_" in "lab_us-gaap_Taxes_IDCHARSBLAHBLAH"
-                suffix_dict["label"] = labels_to_move
-                break
+        rank = return_label_id_suffix_rank(id_str, suffix_rank_dict)
+        if rank is not None:
+            suffix_dict_list[rank]["label"] = labels_to_move
     # remove big label dict
     dict_to_return.pop("label", None)
 
 
     dict_to_return = {ticker: dict_to_return}
     json_filename = "{}_facts_dict.json".format(folder_name)
-    write_dict_as_json(dict_to_return, json_filename)
+    write_dict_as_json(dict_to_return, json_filename, compact=compact_json, index_filename=return_facts_dict_index_filename(json_filename))
+    end_profile_stage(profiler, stage_dict)
+    fact_column_dict = None
+    if fact_columns_format:
+        stage_dict = start_profile_stage(profiler, "fact_columns", format=fact_columns_format)
+        fact_column_dict = return_fact_column_dict(root_node, context_dict)
+        write_fact_columns(fact_column_dict, folder_name, fact_columns_format)
+        end_profile_stage(profiler, stage_dict)
+    if sqlite_filename:
+        stage_dict = start_profile_stage(profiler, "sqlite")
+        if fact_column_dict is None:
+            fact_column_dict = return_fact_column_dict(root_node, context_dict)
+        filing_dict = return_filing_dict(root_node, ticker, folder_name, cik, form_type, filing_date)
+        write_filing_to_sqlite(sqlite_filename, filing_dict, context_dict, fact_column_dict, dict_to_return[ticker])
+        end_profile_stage(profiler, stage_dict)
+    return dict_to_return
 
+def return_label_id_suffix_rank(id_str, suffix_rank_dict):
+    ''' rank of the first suffix with "_{suffix}_" in id_str, by dict lookups rather than a substring search per suffix.
+        whatever sits between two underscores is a run of the "_" split tokens, not counting the first and last,
+        so those runs are exactly the suffixes that can match: lab_us-gaap_Taxes_XYZ -> us-gaap, us-gaap_Taxes, Taxes
+    '''
+    token_list = id_str.split("_")
+    best_rank = None
+    for start_index in range(1, len(token_list) - 1):
+        for end_index in range(start_index + 1, len(token_list)):
+            rank = suffix_rank_dict.get("_".join(token_list[start_index:end_index]))
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank = rank
+    return best_rank
+def return_fact_column_dict(root_node, context_dict=None):
+    ''' the numeric facts (the ones with a unitRef) as columns, {column name: list}, see FACT_COLUMN_LIST.
+        every fact is a row, including ones the facts dict drops for a more precise duplicate,
+        so pick by decimals when that matters.
+    '''
+    if context_dict is None:
+        context_dict = anytree.findall_by_attr(root_node, "context_dict", maxlevel=2)[0].attrib
+    fact_column_dict = {column: [] for column, column_type in FACT_COLUMN_LIST}
+    for node in anytree.PreOrderIter(root_node):
+        fact = getattr(node, "fact", None)
+        attrib = getattr(node, "attrib", None)
+        if not fact or not isinstance(attrib, dict):
+            continue
+        unit_ref = attrib.get("unitRef")
+        context_ref = attrib.get("contextRef")
+        if not (unit_ref and context_ref):
+            continue
+        period = context_dict.get(context_ref)
+        if not period:
+            continue
+        period_start, _, period_end = period.rpartition(":")
+        fact_column_dict["concept"].append(getattr(node, "suffix", None) or node.name)
+        fact_column_dict["prefix"].append(getattr(node, "prefix", None) or "")
+        fact_column_dict["context_ref"].append(context_ref)
+        fact_column_dict["period_start"].append(period_start)
+        fact_column_dict["period_end"].append(period_end)
+        fact_column_dict["instant"].append(not period_start)
+        fact_column_dict["dimensions"].append(return_fact_dimensions(node))
+        fact_column_dict["unit"].append(unit_ref)
+        fact_column_dict["decimals"].append(return_float_or_nan(return_decimals_int(attrib.get("decimals"))))
+        fact_column_dict["value"].append(return_float_or_nan(return_fact_value(fact)))
+    return fact_column_dict
+def return_fact_dimensions(node):
+    ''' the Axis/Member subparents above a fact, "StatementGeographicalAxis=USMember|ProductOrServiceAxis=WidgetMember" '''
+    axis_member_list = []
+    parent = node.parent
+    while parent is not None and getattr(parent, "axis", False):
+        axis_member_list.insert(0, parent.suffix)
+        parent = parent.parent
+    dimension_list = []
+    for axis_or_member in axis_member_list:
+        if dimension_list and axis_or_member.endswith("Member") and dimension_list[-1].endswith("Axis"):
+            dimension_list[-1] = "{}={}".format(dimension_list[-1], axis_or_member)
+        else:
+            dimension_list.append(axis_or_member)
+    return "|".join(dimension_list)
+def return_float_or_nan(value):
+    if value is None:
+        return math.nan
+    return float(value)
+def return_decimals_int(decimals):
+    ''' the decimals attribute as an int, "INF" (exact) as inf so it orders above any number,
+        None if it's missing or not a number
+    '''
+    if decimals is None:
+        return None
+    decimals = str(decimals).strip()
+    if decimals.upper() == "INF":
+        return math.inf
+    try:
+        return int(decimals)
+    except ValueError:
+        return None
+def return_fact_value(fact, exact=False):
+    ''' a numeric fact as a float, or a Decimal with exact=True, None if it isn't a number '''
+    if fact is None:
+        return None
+    fact = str(fact).strip()
+    if exact:
+        try:
+            value = decimal.Decimal(fact)
+        except decimal.InvalidOperation:
+            return None
+        if not value.is_finite():
+            return None
+        return value
+    try:
+        value = float(fact)
+    except ValueError:
+        return None
+    if not math.isfinite(value):
+        return None
+    return value
+def return_float_array(value_list):
+    ''' contiguous float64 array, numpy if it's installed '''
+    if numpy is not None:
+        return numpy.array(value_list, dtype=numpy.float64)
+    return array.array("d", value_list)
+class FactArrays:
+    ''' one filing's numeric facts (return_fact_column_dict) parsed once: decimals and value are contiguous
+        float arrays (numpy when installed, array.array otherwise, nan where missing, inf for INF decimals),
+        the other columns stay lists. the helpers work on whole columns, so nothing is re-parsed per query.
+
+        revenue = FactArrays(return_fact_column_dict(root_node)).filter_units(["usd"]).filter_concepts(["Revenues"])
+        revenue.scaled_values(1e-6)
+    '''
+    def __init__(self, fact_column_dict):
+        self.column_dict = {}
+        for column, column_type in FACT_COLUMN_LIST:
+            column_values = fact_column_dict[column]
+            if column_type is float:
+                column_values = return_float_array(column_values)
+            self.column_dict[column] = column_values
+    def __len__(self):
+        return len(self.column_dict["value"])
+    def __getitem__(self, column):
+        return self.column_dict[column]
+    def take(self, index_list):
+        ''' a FactArrays of just these rows '''
+        fact_column_dict = {}
+        for column, column_type in FACT_COLUMN_LIST:
+            column_values = self.column_dict[column]
+            if column_type is float and numpy is not None:
+                fact_column_dict[column] = column_values[numpy.array(index_list, dtype=numpy.intp)]
+            else:
+                fact_column_dict[column] = [column_values[index] for index in index_list]
+        return FactArrays(fact_column_dict)
+    def return_index_list(self, column, value_list):
+        value_set = set(value_list)
+        return [index for index, value in enumerate(self.column_dict[column]) if value in value_set]
+    def filter_units(self, unit_list, case_sensitive=False):
+        ''' rows in any of these units (unitRef ids, "usd", "shares", ...) '''
+        if case_sensitive:
+            return self.take(self.return_index_list("unit", unit_list))
+        unit_set = {unit.lower() for unit in unit_list}
+        return self.take([index for index, unit in enumerate(self.column_dict["unit"]) if unit.lower() in unit_set])
+    def filter_concepts(self, concept_list):
+        return self.take(self.return_index_list("concept", concept_list))
+    def scaled_values(self, scale):
+        ''' values times scale, e.g. 1e-6 for millions '''
+        value_array = self.column_dict["value"]
+        if numpy is not None:
+            return value_array * scale
+        return array.array("d", [value * scale for value in value_array])
+    def sign_values(self):
+        ''' -1.0, 0.0 or 1.0 per value, nan stays nan '''
+        value_array = self.column_dict["value"]
+        if numpy is not None:
+            return numpy.sign(value_array)
+        return array.array("d", [value if value != value else float((value > 0) - (value < 0)) for value in value_array])
+    def signed_values(self, sign):
+        ''' values with their sign flipped where sign is negative, sign is a number or one per row,
+            for concepts that are reported as positive but mean a reduction
+        '''
+        value_array = self.column_dict["value"]
+        if numpy is not None:
+            return value_array * numpy.where(numpy.asarray(sign) < 0, -1.0, 1.0)
+        if isinstance(sign, (int, float)):
+            sign = [sign] * len(value_array)
+        return array.array("d", [-value if row_sign < 0 else value for value, row_sign in zip(value_array, sign)])
+def write_fact_columns(fact_column_dict, folder_name, file_format="csv"):
+    ''' <folder>_facts.csv/.npz/.parquet, npz needs numpy and parquet needs pyarrow, csv is the fallback '''
+    if file_format not in FACT_COLUMN_FORMATS:
+        logging.error("unknown fact column format: {}".format(file_format))
+        return
+    if file_format == "npz" and numpy is None:
+        logging.warning("numpy is not installed, writing csv fact columns instead")
+        file_format = "csv"
+    elif file_format == "parquet" and pyarrow is None:
+        logging.warning("pyarrow is not installed, writing csv fact columns instead")
+        file_format = "csv"
+    filename = "{}_facts.{}".format(folder_name, file_format)
+    logging.info("writing: {}".format(filename))
+    if file_format == "npz":
+        numpy_type_dict = {str: numpy.str_, bool: numpy.bool_, float: numpy.float64}
+        array_dict = {column: numpy.array(fact_column_dict[column], dtype=numpy_type_dict[column_type]) for column, column_type in FACT_COLUMN_LIST}
+        numpy.savez_compressed(filename, **array_dict)
+    elif file_format == "parquet":
+        pyarrow_type_dict = {str: pyarrow.string(), bool: pyarrow.bool_(), float: pyarrow.float64()}
+        table = pyarrow.table({column: pyarrow.array(fact_column_dict[column], type=pyarrow_type_dict[column_type]) for column, column_type in FACT_COLUMN_LIST})
+        pyarrow.parquet.write_table(table, filename)
+    else:
+        column_list = [column for column, column_type in FACT_COLUMN_LIST]
+        with open(filename, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(column_list)
+            for row in zip(*[fact_column_dict[column] for column in column_list]):
+                csv_row = []
+                for value in row:
+                    if isinstance(value, bool):
+                        value = int(value)
+                    elif isinstance(value, float) and value != value:
+                        # nan is left empty
+                        value = ""
+                    csv_row.append(value)
+                writer.writerow(csv_row)
+def return_filing_dict(root_node, ticker, folder_name, cik=None, form_type=None, date=None):
+    ''' filing metadata for the sqlite filings table, without a date it comes from the <ticker>-<date> folder name
+        (which is always lower case), and stays None if the folder name doesn't have one
+    '''
+    filing_dict = {"ticker": ticker, "cik": cik, "sic": None, "country_code": None, "form_type": form_type, "date": None}
+    for child in root_node.children:
+        if child.name in ["sic", "country_code"]:
+            filing_dict[child.name] = getattr(child, "attrib", None)
+    if date is not None:
+        filing_dict["date"] = str(date)
+    else:
+        ticker_date = os.path.basename(os.path.normpath(folder_name))
+        match = re.fullmatch(re.escape(ticker.lower()) + r"-([0-9]{8})", ticker_date.lower())
+        if match:
+            filing_dict["date"] = match.group(1)
+    if form_type is None:
+        # XBRL_Data/<ticker>/<form type>/<ticker>-<date>
+        filing_dict["form_type"] = os.path.basename(os.path.dirname(os.path.normpath(folder_name))) or None
+    for key in ["cik", "sic", "country_code"]:
+        if filing_dict[key] is not None:
+            filing_dict[key] = str(filing_dict[key])
+    return filing_dict
+def return_sqlite_filing_id(sqlite_filename, filing_dict):
+    ''' the filing_id of a filing already in the sqlite fact store, None if it isn't there '''
+    connection = sqlite3.connect(sqlite_filename)
+    try:
+        with connection:
+            connection.executescript(SQLITE_SCHEMA)
+            filing_key = (filing_dict["ticker"], filing_dict["form_type"], filing_dict["date"])
+            row = connection.execute("SELECT filing_id FROM filings WHERE ticker IS ? AND form_type IS ? AND date IS ?", filing_key).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+    return row[0]
+def store_existing_filing_in_sqlite(root_node, ticker, folder_name, sqlite_filename, cik=None, form_type=None, filing_date=None, profiler=None):
+    ''' for filings whose facts dict was written before (so convert_root_node_facts_to_fact_dict is skipped),
+        adds them to the sqlite fact store if they aren't in it yet, the labels come from the existing facts dict
+    '''
+    filing_dict = return_filing_dict(root_node, ticker, folder_name, cik, form_type, filing_date)
+    if filing_dict["date"] is None or return_sqlite_filing_id(sqlite_filename, filing_dict) is not None:
+        return
+    stage_dict = start_profile_stage(profiler, "sqlite")
+    context_dict = anytree.findall_by_attr(root_node, "context_dict", maxlevel=2)[0].attrib
+    fact_column_dict = return_fact_column_dict(root_node, context_dict)
+    existing_facts_dict = import_facts_dict("{}_facts_dict.json".format(folder_name))
+    facts_dict = existing_facts_dict.get(ticker)
+    if facts_dict is None:
+        # it's keyed by the ticker it was written with, there's only the one
+        facts_dict = next(iter(existing_facts_dict.values()), {})
+    write_filing_to_sqlite(sqlite_filename, filing_dict, context_dict, fact_column_dict, facts_dict)
+    end_profile_stage(profiler, stage_dict)
+def write_filing_to_sqlite(sqlite_filename, filing_dict, context_dict, fact_column_dict, facts_dict):
+    ''' adds (or replaces) a filing in the sqlite fact store: filings, contexts, units, facts and labels.
+        facts are the numeric facts of return_fact_column_dict, labels come from the facts dict.
+        the filing is replaced by ticker, form type and date, so without a date nothing is written.
+    '''
+    if filing_dict["date"] is None:
+        logging.error("no filing date for {} {}, not writing it to {}".format(filing_dict["ticker"], filing_dict["form_type"], sqlite_filename))
+        return
+    logging.info("writing: {} to {}".format(filing_dict["ticker"], sqlite_filename))
+    connection = sqlite3.connect(sqlite_filename)
+    try:
+        with connection:
+            connection.executescript(SQLITE_SCHEMA)
+            filing_key = (filing_dict["ticker"], filing_dict["form_type"], filing_dict["date"])
+            row = connection.execute("SELECT filing_id FROM filings WHERE ticker IS ? AND form_type IS ? AND date IS ?", filing_key).fetchone()
+            if row is not None:
+                filing_id = row[0]
+                for table in ["contexts", "units", "facts", "labels"]:
+                    connection.execute("DELETE FROM {} WHERE filing_id = ?".format(table), (filing_id,))
+                connection.execute("UPDATE filings SET cik = ?, sic = ?, country_code = ? WHERE filing_id = ?",
+                                   (filing_dict["cik"], filing_dict["sic"], filing_dict["country_code"], filing_id))
+            else:
+                cursor = connection.execute("INSERT INTO filings (ticker, cik, sic, country_code, form_type, date) VALUES (?, ?, ?, ?, ?, ?)",
+                                            (filing_dict["ticker"], filing_dict["cik"], filing_dict["sic"], filing_dict["country_code"], filing_dict["form_type"], filing_dict["date"]))
+                filing_id = cursor.lastrowid
+            context_row_list = []
+            for context_ref, period in context_dict.items():
+                period_start, _, period_end = str(period).rpartition(":")
+                context_row_list.append((filing_id, context_ref, period_start or None, period_end, int(not period_start)))
+            connection.executemany("INSERT INTO contexts VALUES (?, ?, ?, ?, ?)", context_row_list)
+            connection.executemany("INSERT INTO units VALUES (?, ?)", [(filing_id, unit_ref) for unit_ref in sorted(set(fact_column_dict["unit"]))])
+            column_list = ["concept", "prefix", "context_ref", "period_start", "period_end", "instant", "dimensions", "unit", "decimals", "value"]
+            fact_row_list = []
+            for row in zip(*[fact_column_dict[column] for column in column_list]):
+                # nan goes in as NULL
+                fact_row_list.append((filing_id, filing_dict["ticker"]) + row)
+            connection.executemany("INSERT INTO facts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", fact_row_list)
+            label_row_list = []
+            for concept, concept_dict in facts_dict.items():
+                if not isinstance(concept_dict, dict):
+                    continue
+                label_dict = concept_dict.get("label")
+                if isinstance(label_dict, dict):
+                    for role, label in label_dict.items():
+                        label_row_list.append((filing_id, concept, role, label))
+            connection.executemany("INSERT INTO labels VALUES (?, ?, ?, ?)", label_row_list)
+    finally:
+        connection.close()
+def query_sqlite_facts(sqlite_filename, concept, ticker_list=None, period_end=None):
+    ''' (ticker, period_start, period_end, dimensions, unit_ref, decimals, value) rows for a concept,
+        optionally for some tickers or a single period end
+    '''
+    query = "SELECT ticker, period_start, period_end, dimensions, unit_ref, decimals, value FROM facts WHERE concept = ?"
+    parameter_list = [concept]
+    if ticker_list:
+        query += " AND ticker IN ({})".format(", ".join("?" * len(ticker_list)))
+        parameter_list.extend(ticker_list)
+    if period_end:
+        query += " AND period_end = ?"
+        parameter_list.append(period_end)
+    connection = sqlite3.connect(sqlite_filename)
+    try:
+        return connection.execute(query, parameter_list).fetchall()
+    finally:
+        connection.close()
 def recursive_set_axis_member_dict(node, node_dict, axis_or_member, axis_member_list, date, fact, axis_or_member_index=1):
     if node_dict is None:
         ## this just means it's a new axis member dict
@@ -1264,8 +2542,13 @@ def recursive_set_axis_member_dict(node, node_dict, axis_or_member, axis_member_
         if not axis_or_member_entry:
             node_dict[axis_or_member] = {date: fact, "{}_attrib".format(date): attrib}
         else:
-            previous_fact = node_dict.get(axis_or_member).get(date)
-            if previous_fact is not None:
+            # update the member dict in place, so other dates (and deeper axes) already in it are kept
+            member_dict = node_dict.get(axis_or_member)
+            previous_fact = member_dict.get(date)
+            if previous_fact is None:
+                member_dict[date] = fact
+                member_dict["{}_attrib".format(date)] = attrib
+            else:
                 if previous_fact != fact:
                     #logging.info("fact: {}".format(fact))
                     #logging.info("existing: {}".format(previous_fact))
@@ -1273,20 +2556,22 @@ def recursive_set_axis_member_dict(node, node_dict, axis_or_member, axis_member_
                     #logging.info(pp.pformat(node_dict.get(axis_or_member)))
                     #logging.info("not get the date_attrib")
                     #logging.info(pp.pformat(node_dict.get(axis_or_member).get("{}_attrib".format(date))))
-                    node_decimals = node.attrib.get("decimals")
+                    node_decimals = return_decimals_int(node.attrib.get("decimals"))
 
 
-                    previous_attrib = node_dict.get(axis_or_member).get("{}_attrib".format(date))
-                    existing_decimals = previous_attrib.get("decimals")
+                    previous_attrib = member_dict.get("{}_attrib".format(date))
+                    existing_decimals = return_decimals_int(previous_attrib.get("decimals"))
 
                     #logging.info("Check precision: {}|{}".format(node_decimals, existing_decimals))
-                    if existing_decimals > node_decimals:
+                    if existing_decimals is None or node_decimals is None:
+                        'precision can not be compared, keep the existing fact'
+                    elif existing_decimals > node_decimals:
                         'ignore this'
                         #logging.info("Ignoring less precise data.")
                     elif node_decimals > existing_decimals:
                         #logging.info("Replace with fact with better precision.")
-                        node_dict[date] = fact
-                        node_dict["{}_attrib".format(date)] = node.attrib
+                        member_dict[date] = fact
+                        member_dict["{}_attrib".format(date)] = node.attrib
                     elif node_decimals == existing_decimals:
                         #logging.info("Same decimals: taking longer str")
                         #logging.info(fact)
@@ -1295,8 +2580,8 @@ def recursive_set_axis_member_dict(node, node_dict, axis_or_member, axis_member_
                         #logging.info(node_dict.get(axis_or_member))
                         #logging.info(type(node_dict.get(date)))
                         if len(fact) > len(previous_fact):
-                            node_dict[date] = fact
-                            node_dict["{}_attrib".format(date)] = node.attrib
+                            member_dict[date] = fact
+                            member_dict["{}_attrib".format(date)] = node.attrib
                     else:
                         logging.info("##### {} = {} vs {}".format(axis_or_member, previous_fact, fact))
                         logging.info(node_dict.get(axis_or_member))
@@ -1304,16 +2589,16 @@ def recursive_set_axis_member_dict(node, node_dict, axis_or_member, axis_member_
                 else:
                     'duplicate'
                     #logging.info("Fact is dublicate")
-            node_dict[axis_or_member] = {date: fact, "{}_attrib".format(date): attrib}
     return node_dict
-def return_existing_facts_dict(ticker, form_type, date=None):
+def return_existing_facts_dict(ticker, form_type, date=None, lazy=False):
+    ''' lazy=True gives a read only LazyJsonMapping, for when only a few concepts are needed '''
     if date:
         filename = os.path.join("XBRL_Data", ticker.lower(), form_type, "{}-{}_facts_dict.json".format(ticker.lower(), date))
-        if os.path.exits(filename):
-            return import_json(filename)
+        if os.path.exists(filename):
+            return import_facts_dict(filename, lazy=lazy)
     else:
-        return return_most_recent_facts_dict()
-def return_most_recent_facts_dict(ticker, form_type):
+        return return_most_recent_facts_dict(ticker, form_type, lazy=lazy)
+def return_most_recent_facts_dict(ticker, form_type, lazy=False):
     folder_name = os.path.join("XBRL_Data", ticker.lower(), form_type)
     most_recent = None
     if not does_file_exist_in_dir(folder_name):
@@ -1332,12 +2617,95 @@ def return_most_recent_facts_dict(ticker, form_type):
                     most_recent = (date_time_obj, filename)
 
     file_path = os.path.join("XBRL_Data", ticker.lower(), form_type, most_recent[1])
-    return import_json(file_path)
+    return import_facts_dict(file_path, lazy=lazy)
 #### extract xbrl data from tree ####
-def get_data_node(root_node, attribute_name, date=None, subcategory=None):
-    if date is not None:
-        context_dict = anytree.findall_by_attr(root_node, "context_dict", maxlevel=2)[0].attrib
-    node_tuple = anytree.findall_by_attr(root_node, attribute_name, maxlevel=2)
+class FilingQueryIndex:
+    ''' lookups for one converted filing tree, so repeated get_data_node calls don't rescan it:
+        concept name -> depth 1 nodes, period (context_dict value) -> contextRefs,
+        and (concept node, contextRef) -> first fact node, built per concept the first time it's asked for.
+        it's a snapshot, make a new one if the tree changes.
+    '''
+    def __init__(self, root_node):
+        self.root_node = root_node
+        self.concept_node_dict = {}
+        # like findall_by_attr(root_node, name, maxlevel=2), the root counts too
+        for node in [root_node] + list(root_node.children):
+            self.concept_node_dict.setdefault(node.name, []).append(node)
+        self.context_dict = {}
+        context_dict_node_list = self.concept_node_dict.get("context_dict")
+        if context_dict_node_list:
+            self.context_dict = context_dict_node_list[0].attrib
+        self.period_context_ref_dict = {}
+        for context_ref, period in self.context_dict.items():
+            self.period_context_ref_dict.setdefault(period, []).append(context_ref)
+        self.context_ref_node_dict = {}
+        # the period table, each distinct period string parsed once
+        self.context_period_dict = {}
+        for period in self.period_context_ref_dict:
+            try:
+                context_period = return_context_period(period)
+            except ValueError as e:
+                # an impossible date like 2019-02-30, those contextRefs just have no period
+                logging.warning("{} is not a valid period, skipping its contexts: {}".format(period, e))
+                context_period = None
+            for context_ref in self.period_context_ref_dict[period]:
+                self.context_period_dict[context_ref] = context_period
+    def return_concept_node_list(self, attribute_name):
+        return self.concept_node_dict.get(attribute_name, [])
+    def return_period_context_refs(self, period):
+        return self.period_context_ref_dict.get(period, [])
+    def return_context_period(self, context_ref):
+        ''' the ContextPeriod of a contextRef, None if it has no (valid) period '''
+        return self.context_period_dict.get(context_ref)
+    def return_context_ref_node(self, concept_node, context_ref):
+        ''' the first node (in pre-order) under concept_node with this contextRef '''
+        context_ref_node_dict = self.context_ref_node_dict.get(concept_node)
+        if context_ref_node_dict is None:
+            context_ref_node_dict = {}
+            for subnode in anytree.PreOrderIter(concept_node):
+                attrib = getattr(subnode, "attrib", None)
+                if isinstance(attrib, dict):
+                    subnode_context_ref = attrib.get("contextRef")
+                    if subnode_context_ref:
+                        context_ref_node_dict.setdefault(subnode_context_ref, subnode)
+            self.context_ref_node_dict[concept_node] = context_ref_node_dict
+        return context_ref_node_dict.get(context_ref)
+ContextPeriod = collections.namedtuple("ContextPeriod", ["start", "end", "days", "term"])
+def return_context_period(period):
+    ''' a context_dict value ("2020-01-01:2020-12-31" or "2020-12-31") as a ContextPeriod:
+        start (None for instants), end, days (None for instants), and term, "Y", "Q", or None
+        for instants and other lengths (half years, nine months).
+    '''
+    if not isinstance(period, str) or not period:
+        return None
+    end_datetime, start_datetime, time_delta = convert_to_datetime(period)
+    if end_datetime is None:
+        return None
+    days = None
+    term = None
+    if time_delta is not None:
+        days = time_delta.days
+        if days >= ANNUAL_PERIOD_MIN_DAYS:
+            term = "Y"
+        elif QUARTER_PERIOD_DAYS[0] <= days <= QUARTER_PERIOD_DAYS[1]:
+            term = "Q"
+    return ContextPeriod(start_datetime, end_datetime, days, term)
+# root node -> FilingQueryIndex, dropped with the tree
+filing_query_index_cache = weakref.WeakKeyDictionary()
+def return_filing_query_index(root_node):
+    query_index = filing_query_index_cache.get(root_node)
+    if query_index is None:
+        query_index = FilingQueryIndex(root_node)
+        filing_query_index_cache[root_node] = query_index
+    return query_index
+def get_data_node(root_node, attribute_name, date=None, subcategory=None, query_index=None):
+    ''' the concept node, or with a date (a context_dict value) the fact node for that period.
+        lookups go through the filing's FilingQueryIndex, which is cached per root node,
+        pass query_index=FilingQueryIndex(root_node) if the tree has changed since.
+    '''
+    if query_index is None:
+        query_index = return_filing_query_index(root_node)
+    node_tuple = query_index.return_concept_node_list(attribute_name)
 
     if node_tuple:
         if len(node_tuple) != 1:
@@ -1348,15 +2716,17 @@ def get_data_node(root_node, attribute_name, date=None, subcategory=None):
             return node
         # else let's find the date
         context_ref = None
-        context_ref_list = [key for key, value in context_dict.items() if value == date]
+        context_ref_list = query_index.return_period_context_refs(date)
         if len(context_ref_list) == 1:
-            return context_ref_list[0]
-        if not subcategory:
+            context_ref = context_ref_list[0]
+        elif not subcategory:
             context_ref_list = [ref for ref in context_ref_list if not '_' in ref]
             if len(context_ref_list) > 1:
                 logging.error("More than one base category date")
                 #logging.info(pp.pformat(context_ref_list))
                 sys.exit()
+            if not context_ref_list:
+                return
             context_ref = context_ref_list[0]
         else:
             subcategory_list = []
@@ -1373,14 +2743,7 @@ def get_data_node(root_node, attribute_name, date=None, subcategory=None):
                 sys.exit()
             context_ref = subcategory_list[0]
         if context_ref:
-            for subnode in anytree.PreOrderIter(node):
-                try:
-                    subnode_context_ref = subnode.attrib.get("contextRef")
-                except:
-                    continue
-                if subnode_context_ref:
-                    if context_ref == subnode_context_ref:
-                        return subnode
+            return query_index.return_context_ref_node(node, context_ref)
     else:
         logging.error("No attributes of that name")
 def convert_to_datetime(string_date_YYYY_MM_DD):
@@ -1426,13 +2789,19 @@ def y_or_q_and_form_type_from_limit_data(Y_or_Q, form_type):
 def get_most_recent_data(root_node, attribute_name, Y_or_Q=None, form_type=None, subcategory=None):
 
     return get_most_recent_multiple_instances(root_node, attribute_name, 1, Y_or_Q=Y_or_Q, form_type=form_type, subcategory=subcategory)[0]
-def get_most_recent_multiple_instances(root_node, attribute_name, number_of_instances, Y_or_Q=None, form_type=None, subcategory=None):
+def get_most_recent_multiple_instances(root_node, attribute_name, number_of_instances, Y_or_Q=None, form_type=None, subcategory=None, query_index=None):
+    ''' the number_of_instances most recent fact nodes, newest period end first (ties keep document order).
+        periods come from the filing's period table, durations of the wrong term for Y_or_Q are skipped,
+        instants are kept, and the same fact for the same period only counts once.
+    '''
     if not Y_or_Q:
         Y_or_Q, form_type = y_or_q_and_form_type_from_limit_data(Y_or_Q, form_type)
 
-    context_dict = anytree.findall_by_attr(root_node, "context_dict", maxlevel=2)[0].attrib
+    if query_index is None:
+        query_index = return_filing_query_index(root_node)
+    context_dict = query_index.context_dict
 
-    relevant_node = anytree.findall_by_attr(root_node, attribute_name, maxlevel=2)
+    relevant_node = query_index.return_concept_node_list(attribute_name)
     if not relevant_node:
         logging.warning("no relevant node")
         return
@@ -1477,57 +2846,28 @@ def get_most_recent_multiple_instances(root_node, attribute_name, number_of_inst
                 narrowed_list.append(node_contextRef_date_tuple)
     node_contextRef_date_tuple_list = narrowed_list
 
-    most_recent_list = []
-    for node_contextRef_date_tuple in node_contextRef_date_tuple_list:
-        context_date = node_contextRef_date_tuple[2]
-        end_datetime, start_date, time_delta = convert_to_datetime(context_date)
-        if not most_recent_list:
-            most_recent_list.append(node_contextRef_date_tuple)
-        for index, existing_node_contextRef_date_tuple_list in enumerate(most_recent_list):
-            newer_than_index = None
-            existing_context_date = existing_node_contextRef_date_tuple_list[2]
-            existing_end_datetime, existing_start_date, existing_time_delta = convert_to_datetime(existing_context_date)
-            if end_datetime > existing_end_datetime:
-                newer_than_index = index
-            elif end_datetime == existing_end_datetime:
-                try:
-                    node_fact = node_contextRef_date_tuple_list[0].fact
-                except:
-                    node_fact = None
-                try:
-                    existing_fact = existing_node_contextRef_date_tuple_list[0].fact
-                except:
-                    existing_fact = None
-                if node_fact == existing_fact:
-                    if start_date == existing_start_date:
-                        logging.warning("duplicate fact, skipping")
-                        continue
-                    else:
-                        if time_delta is not None:
-                            if Y_or_Q == "Y":
-                                if time_delta.days() < 300:
-                                    logging.warning("quarterly term for annual request, skipping")
-                                    continue
-                            elif Y_or_Q == "Q":
-                                if time_delta.days() > 50:
-                                    logging.warning("annual term for quarterly request, skipping")
-                                    continue
-                    logging.warning("odd, but near identical facts are being grouped together")
-                    newer_than_index = index
-            if newer_than_index:
-                most_recent_list.insert(newer_than_index, node_contextRef_date_tuple)
-
-    if most_recent_list:
-        most_recent_list = [node_ref_date_triple[0] for node_ref_date_triple in most_recent_list]
+    candidate_list = []
+    seen_fact_set = set()
+    for order, (node, basic_contextRef, the_context) in enumerate(node_contextRef_date_tuple_list):
+        context_period = query_index.return_context_period(basic_contextRef)
+        if context_period is None:
+            logging.warning("{} has no valid period, skipping".format(basic_contextRef))
+            continue
+        if context_period.days is not None and context_period.term != Y_or_Q:
+            logging.info("{} day term for a {} request, skipping".format(context_period.days, Y_or_Q))
+            continue
+        fact_key = (context_period.end, context_period.start, getattr(node, "fact", None))
+        if fact_key in seen_fact_set:
+            logging.info("duplicate fact, skipping")
+            continue
+        seen_fact_set.add(fact_key)
+        candidate_list.append((context_period.end, -order, node))
+    most_recent_list = [node for end_datetime, negative_order, node in heapq.nlargest(number_of_instances, candidate_list, key=lambda candidate: candidate[:2])]
 
     if not most_recent_list:
         logging.warning("There are no facts that match that search")
         return
-    elif len(most_recent_list) < number_of_instances:
-        #logging.info([[x[1], x[2]] for x in most_recent_list])
-        return most_recent_list
-    else:
-        return most_recent_list[0:number_of_instances]
+    return most_recent_list
 def print_all_simple_context_refs(root_node):
     pattern = re.compile(r'[A-Z]{1,2}[0-9]{4}[A-Z]{1}[0-9]{1}(YTD|QTD)?(?=\s)')
     simple_context_set = set()